@@ -0,0 +1,65 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ── HubSpot ─────────────────────────────────────────────────────────────────
+HUBSPOT_API_KEY = os.getenv("HUBSPOT_API_KEY")
+# Overridable so syncs can be pointed at a local stand-in.
+HUBSPOT_BASE_URL = os.getenv("HUBSPOT_BASE_URL", "https://api.hubapi.com")
+HUBSPOT_HEADERS = {
+    "Authorization": f"Bearer {HUBSPOT_API_KEY}",
+    "Content-Type": "application/json"
+}
+
+SEARCH_PAGE_LIMIT = 100      # max page size accepted by the search endpoint
+SEARCH_RESULT_CAP = 10000    # search refuses to page past this many results
+
+# Async client: max requests in flight (and pooled keep-alive connections).
+HUBSPOT_CONCURRENCY = int(os.getenv("HUBSPOT_CONCURRENCY", "4"))
+# Number of date-range shards time entries are fetched in; 1 = serial paging.
+HUBSPOT_TIME_ENTRY_SHARDS = int(os.getenv("HUBSPOT_TIME_ENTRY_SHARDS", "4"))
+# Lower edge for planning full-sync shards (the first shard is open-ended).
+HUBSPOT_HISTORY_START = os.getenv("HUBSPOT_HISTORY_START", "2023-01-01")
+
+# Property projection: HubSpot properties fetched (and kept in `raw`) beyond
+# the ones mapped onto columns.  Comma-separated; "*" on time entries fetches
+# every property in the schema (the old behaviour).
+HUBSPOT_COMPANY_EXTRA_PROPERTIES = [
+    p.strip() for p in os.getenv("HUBSPOT_COMPANY_EXTRA_PROPERTIES", "").split(",") if p.strip()]
+HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES = [
+    p.strip() for p in os.getenv("HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES", "").split(",") if p.strip()]
+# How long a fetched object schema is reused before asking HubSpot again.
+HUBSPOT_SCHEMA_TTL_SECONDS = int(os.getenv("HUBSPOT_SCHEMA_TTL_SECONDS", "3600"))
+
+# Webhooks: the app's client secret signs every delivery (v3 signatures).
+HUBSPOT_CLIENT_SECRET = os.getenv("HUBSPOT_CLIENT_SECRET")
+# Public URL HubSpot posts to, when it differs from what the app sees behind a
+# proxy; it is part of the signed string.
+HUBSPOT_WEBHOOK_URL = os.getenv("HUBSPOT_WEBHOOK_URL")
+# Events are collected for this long before the affected objects are fetched.
+HUBSPOT_WEBHOOK_FLUSH_SECONDS = float(os.getenv("HUBSPOT_WEBHOOK_FLUSH_SECONDS", "5"))
+
+# ── Sync scheduler ──────────────────────────────────────────────────────────
+# Opt-in, and enabled on ONE host only: sync de-duplication works within a
+# process, so every backend running it would sync on its own and overwrite the
+# others' sync_state.  Never runs in the packaged desktop app (PACKAGED=1),
+# where each open client starts its own backend.
+SYNC_SCHEDULER_ENABLED = (os.getenv("SYNC_SCHEDULER_ENABLED", "0") == "1"
+                          and os.getenv("PACKAGED") != "1")
+# Seconds between incremental runs of each object; 0 disables that object.
+SYNC_INTERVAL_TIME_ENTRIES = float(os.getenv("SYNC_INTERVAL_TIME_ENTRIES", "600"))
+SYNC_INTERVAL_COMPANIES = float(os.getenv("SYNC_INTERVAL_COMPANIES", "3600"))
+SYNC_INTERVAL_OWNERS = float(os.getenv("SYNC_INTERVAL_OWNERS", "21600"))
+# Each wait is randomised by ± this fraction so runs don't line up.
+SYNC_JITTER = float(os.getenv("SYNC_JITTER", "0.1"))
+
+# ── Report cache ────────────────────────────────────────────────────────────
+# Report results kept in memory (least recently used evicted first); 0 disables.
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "128"))
+# How long the data version (newest updated_at of the synced tables, the
+# rollup and sync_state) is trusted before it is read again; changes made by
+# this process apply immediately.
+REPORT_CACHE_VERSION_SECONDS = float(os.getenv("REPORT_CACHE_VERSION_SECONDS", "5"))
+# Re-run the default dashboard reports after each sync so the next load is warm.
+REPORT_CACHE_WARMUP = os.getenv("REPORT_CACHE_WARMUP", "1") == "1"
@@ -8,11 +8,26 @@ import os
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.routers import hubspot, companies, time_entries, reports
+from app.core.config import SYNC_SCHEDULER_ENABLED
+from app.services.sync_scheduler import sync_scheduler
+from app.services.conditional_get import ConditionalGetMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ── 2) Keep HubSpot data fresh without anyone pressing "sync" ──
+    if SYNC_SCHEDULER_ENABLED:
+        sync_scheduler.start()
+    yield
+    await sync_scheduler.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -21,8 +36,13 @@ origins = [
 
 ]
 allow_all = os.getenv("PACKAGED") == "1"
+# ETag / 304 for report and data GETs; added first so CORS wraps the 304s too
+app.add_middleware(ConditionalGetMiddleware)
+# large report payloads are compressed when the client accepts gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 app.add_middleware(CORSMiddleware, allow_origins=["*"] if allow_all else origins,
-                   allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+                   allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+                   expose_headers=["X-Total-Count", "X-Next-Cursor"])
 
 app.include_router(hubspot.router)
 app.include_router(companies.router)
@@ -1,22 +1,111 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import json
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request
+from app.core.config import HUBSPOT_WEBHOOK_URL
 from app.services import hubspot
+from app.services.sync_jobs import sync_jobs, SyncConflict
+from app.services.sync_scheduler import sync_scheduler
+from app.services import rate_limit
+from app.services.hubspot_webhooks import webhook_batcher, verify_signature, InvalidSignature
 
 router = APIRouter(prefix="/hubspot", tags=["HubSpot"])
 
 
-@router.post("/sync")
-def sync_hubspot_data(background_tasks: BackgroundTasks):
+def _start_sync(background_tasks: BackgroundTasks, kind: str, full: bool, label: str):
+    target = hubspot.SYNC_TARGETS[kind]
     try:
-        background_tasks.add_task(hubspot.sync_all_data)
-        return {"status": "started", "message": "HubSpot full sync started"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        job, created = sync_jobs.submit(kind, full)
+    except SyncConflict as e:
+        raise HTTPException(status_code=409, detail={
+            "message": str(e), "job": e.running.to_dict()})
+
+    if not created:
+        return {"status": "already_running", "job_id": job.id,
+                "message": f"{label} coalesced onto running sync {job.id}"}
+
+    background_tasks.add_task(sync_jobs.run, job, target)
+    return {"status": "started", "job_id": job.id, "message": f"{label} started"}
+
+
+@router.post("/sync")
+def sync_hubspot_data(
+    background_tasks: BackgroundTasks,
+    full: bool = Query(
+        False, description="Ignore the stored watermark; re-fetch and re-write everything")
+):
+    return _start_sync(background_tasks, "full", full,
+                       f"HubSpot {'full' if full else 'incremental'} sync")
 
 
 @router.post("/time-sync")
-def sync_hubspot_time_data(background_tasks: BackgroundTasks):
+def sync_hubspot_time_data(
+    background_tasks: BackgroundTasks,
+    full: bool = Query(
+        False, description="Ignore the stored watermark; re-fetch and re-write everything")
+):
+    return _start_sync(background_tasks, "time", full,
+                       f"HubSpot {'full' if full else 'incremental'} time sync")
+
+
+@router.get("/sync/jobs", summary="Running and recently finished sync jobs")
+def list_sync_jobs():
+    current = sync_jobs.current()
+    return {
+        "current": current.to_dict() if current else None,
+        "recent": [j.to_dict() for j in sync_jobs.recent()],
+    }
+
+
+@router.get("/sync/jobs/{job_id}", summary="Progress of a single sync job")
+def get_sync_job(job_id: str):
+    job = sync_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Sync job {job_id} not found")
+    return job.to_dict()
+
+
+@router.get("/sync/history", summary="Persisted timings of past sync runs")
+def sync_history(limit: int = Query(20, ge=1, le=200)):
+    return sync_jobs.history(limit=limit)
+
+
+@router.get("/sync/schedule", summary="Scheduled syncs and their freshness bounds")
+def sync_schedule():
+    return sync_scheduler.status()
+
+
+@router.get("/rate-limit", summary="State of the shared HubSpot rate governor")
+def rate_limit_status():
+    return {
+        "account": rate_limit.governor.stats(),
+        "search": rate_limit.search_governor.stats(),
+    }
+
+
+@router.post("/webhook", summary="Receive HubSpot webhook deliveries")
+async def hubspot_webhook(request: Request):
+    body = await request.body()
+    try:
+        verify_signature(
+            request.method,
+            HUBSPOT_WEBHOOK_URL or str(request.url),
+            body,
+            request.headers.get("X-HubSpot-Request-Timestamp"),
+            request.headers.get("X-HubSpot-Signature-v3"),
+        )
+    except InvalidSignature as e:
+        print(f"[hubspot_webhook] ❌ Rejected delivery: {e}")
+        raise HTTPException(status_code=401, detail=str(e))
+
     try:
-        background_tasks.add_task(hubspot.time_sync)
-        return {"status": "started", "message": "HubSpot time sync started"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        events = json.loads(body or b"[]")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if isinstance(events, dict):
+        events = [events]
+    accepted = webhook_batcher.add(events)
+    return {"received": len(events), "accepted": accepted}
+
+
+@router.get("/webhook/status", summary="Queued webhook changes and counters")
+def hubspot_webhook_status():
+    return {"pending": webhook_batcher.pending(), "stats": dict(webhook_batcher.stats)}
@@ -9,10 +9,21 @@ from fastapi import BackgroundTasks
 from fastapi.responses import StreamingResponse
 from app.services.pdf_service import ReportsService
 import io
+import numpy as np
 from pydantic import Field, BaseModel
 from httpx import RemoteProtocolError
 from typing import Optional, List, Dict
 from app.services.hubspot import fetch_all_users, map_owner_ids_to_users
+from app.services import aggregation, rate_limit
+from app.services.period_buckets import PeriodBuckets
+from app.services.daily_rollup import ANY_TAG, daily_rollup
+from app.services.period_snapshots import period_snapshots
+from app.services.report_cache import report_cache
+from app.services.report_format import shaped_report
+from app.services.entry_columns import (
+    ENTRY_TYPES, NAT, TAGS, EntryColumns, epoch_us_to_iso, group_sum, iter_entry_columns)
+from app.services.pagination import (
+    fetch_all_keyset, fetch_all_sharded, iter_keyset_pages, iter_sharded_pages, window_shards)
 from httpx import RemoteProtocolError
 from postgrest.exceptions import APIError  # NEW
 from datetime import datetime, date, timezone, time, timedelta
@@ -88,70 +99,108 @@ def get_cutoff_windows(month_year: str, num_periods: int):
     return windows
 
 
-def fetch_all_entries(base_query, order_column="id", max_retries=3, log_prefix="[DEBUG]"):
+def fetch_all_entries(make_query, order_column="id", max_retries=3, log_prefix="[DEBUG]",
+                      windows=None):
     """
-    Page through results with ordering + range pagination.
-    Retries on network errors and PostgREST statement timeout (57014).
-    Emits concise debug logs about paging.
+    Fetch every row of `make_query()` with keyset pagination on
+    `order_column` (which must be selected).  `make_query` returns a fresh
+    filtered query each call.  Retries on network errors and PostgREST
+    statement timeout (57014).
+
+    With `windows` (inclusive start/end ISO pairs) the start_time range is
+    split into one shard per window and the shards are fetched concurrently;
+    `make_query` should then leave start_time unfiltered.
     """
-    all_rows, offset, page_size = [], 0, 1000
-    page_idx = 0
+    if windows:
+        return fetch_all_sharded(
+            make_query, window_shards(windows), column="start_time", key=order_column,
+            max_retries=max_retries, log_prefix=log_prefix)
+    return fetch_all_keyset(
+        make_query, key=order_column, max_retries=max_retries, log_prefix=log_prefix)
 
-    while True:
-        q = (
-            base_query
-            .order(order_column, desc=False)
-            .range(offset, offset + page_size - 1)
-        )
 
-        attempt = 0
-        while True:
-            try:
-                batch = q.execute().data or []
-                print(
-                    f"{log_prefix} page={page_idx} offset={offset} size={page_size} rows={len(batch)}")
-                break
-            except RemoteProtocolError:
-                attempt += 1
-                page_size = max(50, page_size // 2)
-                print(
-                    f"{log_prefix} RemoteProtocolError: retry {attempt}/{max_retries}, new_page_size={page_size}")
-                if attempt >= max_retries:
-                    raise
-                q = base_query.order(order_column, desc=False).range(
-                    offset, offset + page_size - 1)
-                continue
-            except APIError as e:
-                payload = e.args[0] if e.args else {}
-                code = payload.get("code") if isinstance(
-                    payload, dict) else None
-                if code == "57014":  # statement timeout
-                    attempt += 1
-                    page_size = max(50, page_size // 2)
-                    backoff = min(0.25 * (2 ** (attempt - 1)), 2.0)
-                    print(
-                        f"{log_prefix} timeout 57014: retry {attempt}/{max_retries}, sleep={backoff:.2f}s, new_page_size={page_size}")
-                    if attempt >= max_retries:
-                        raise
-                    time_module.sleep(backoff)
-                    q = base_query.order(order_column, desc=False).range(
-                        offset, offset + page_size - 1)
-                    continue
-                # Other API errors -> surface
-                raise
-
-        if not batch:
-            break
-
-        all_rows.extend(batch)
-        offset += page_size
-        page_idx += 1
-
-    print(f"{log_prefix} total_rows={len(all_rows)} pages={page_idx}")
-    return all_rows
+def iter_entry_pages(make_query, order_column="id", max_retries=3, log_prefix="[DEBUG]",
+                     windows=None):
+    """
+    Streaming fetch_all_entries: yields pages as they arrive so reports can
+    aggregate each one and drop it.  With `windows`, pages from different
+    windows arrive interleaved.
+    """
+    if windows:
+        return iter_sharded_pages(
+            make_query, window_shards(windows), column="start_time", key=order_column,
+            max_retries=max_retries, log_prefix=log_prefix)
+    return iter_keyset_pages(
+        make_query, key=order_column, max_retries=max_retries, log_prefix=log_prefix)
+
+
+def period_columns(windows, make_query, companies=None, entry_type=None, neq_tag=ANY_TAG,
+                   order_column="id", log_prefix="[DEBUG]"):
+    """
+    Yield (source, EntryColumns) covering `windows`, for PeriodBuckets:
+    closed windows come from their frozen snapshots ("snapshot"), open ones
+    from the daily rollup ("rollup") or, when that isn't installed, from
+    time_entries pages ("entries"; `make_query` must apply the same filters
+    and leave start_time unfiltered).  Only "entries" columns carry entry ids.
+    """
+    live = []
+    for window in windows:
+        snap = period_snapshots.get(window, entry_type, neq_tag)
+        if snap is None:
+            live.append(window)
+        else:
+            yield "snapshot", snap.select(companies)
+    if not live:
+        return
+
+    daily = [daily_rollup.select(s, e, companies=companies, entry_type=entry_type, neq_tag=neq_tag)
+             for s, e in live]
+    if all(d is not None for d in daily):
+        for cols in daily:
+            yield "rollup", cols
+        return
+    for cols in iter_entry_columns(iter_sharded_pages(
+            make_query, [(s, e, True) for s, e in live], key=order_column,
+            log_prefix=log_prefix)):
+        yield "entries", cols
+
+
+def usage_buckets(periods, make_query, with_logs=False, by_company=True, rolling=None,
+                  log_prefix="[DEBUG]", **filters):
+    """
+    PeriodBuckets over `periods` (see period_columns for `filters`), and when
+    `with_logs` a second one holding the entry ids of periods[0].
+
+    The report_period_usage() SQL function does all of it in one call when
+    installed.  Otherwise the Python engine runs, and the log ids come from
+    the same pass when it had to scan entries, else from one extra scan of
+    that window alone.
+    """
+    pushed = aggregation.period_usage(
+        periods, rolling=rolling, ids_for_window=0 if with_logs else None,
+        by_company=by_company, **filters)
+    if pushed is not None:
+        print(f"{log_prefix} aggregated in SQL: {pushed.entries} entries")
+        return pushed, (pushed if with_logs else None)
+
+    buckets = PeriodBuckets(periods, companies=filters.get("companies") if by_company else None,
+                            rolling=rolling, by_company=by_company)
+    logs = PeriodBuckets(periods[:1], by_company=by_company, ids_for_window=0)
+    scanned = False
+    for source, cols in period_columns(periods, make_query, log_prefix=log_prefix, **filters):
+        buckets.add(cols)
+        if source == "entries" and with_logs:
+            logs.add(cols)
+            scanned = True
+    if with_logs and not scanned:
+        for cols in iter_entry_columns(iter_entry_pages(
+                make_query, log_prefix=log_prefix, windows=periods[:1])):
+            logs.add(cols)
+    return buckets, (logs if with_logs else None)
 
 
 @router.get("/company-usage")
+@report_cache.cached("company-usage")
 def company_usage_report(
     company_id: int = Query(...),
     period: str = Query(...),
@@ -176,34 +225,25 @@ def company_usage_report(
         # most recent window end (e.g. 2025-06-25T23:59:59Z)
         _, overall_end = periods[0]
 
-        query = (
-            supabase.table("time_entries")
-            .select("id, hours, start_time")
-            .eq("company_hubspot_id", company_id)
-            .gte("start_time", overall_start)
-            .lte("start_time", overall_end)
-            .neq("tag", exclude_tag)
-        )
-        if entry_type:
-            query = query.eq("entry_type", entry_type)
-
-        entries = query.execute().data or []
-
-        # 3) bucket them into each window
-        period_totals = [0.0] * months
-        period_logs = [[] for _ in range(months)]
-
-        for entry in entries:
-            dt = isoparse(entry["start_time"])
-            hrs = float(entry.get("hours") or 0)
-
-            for idx, (start_iso, end_iso) in enumerate(periods):
-                start = isoparse(start_iso)
-                end = isoparse(end_iso)
-                if start <= dt <= end:
-                    period_totals[idx] += hrs
-                    period_logs[idx].append(entry["id"])
-                    break
+        def entries_query():
+            q = (
+                supabase.table("time_entries")
+                .select("id, hours, start_time")
+                .eq("company_hubspot_id", company_id)
+                .neq("tag", exclude_tag)
+            )
+            if entry_type:
+                q = q.eq("entry_type", entry_type)
+            return q
+
+        # 3) bucket them into each window as pages arrive; only the current
+        # window's entry ids are kept (for the logs)
+        buckets, logs = usage_buckets(
+            periods, entries_query, include_logs, by_company=False,
+            log_prefix="[company_usage_report]",
+            companies=[company_id], entry_type=entry_type, neq_tag=exclude_tag)
+        period_totals = buckets.totals()
+        current_logs = logs.window_ids() if include_logs else []
 
         # 4) SLA & stats
         sla_res = (
@@ -229,7 +269,7 @@ def company_usage_report(
             "average": average,
             "percentage_usage": percentage_usage,
             "missing_sla": sla == 0,
-            "current_period_logs": period_logs[0] if include_logs else []
+            "current_period_logs": current_logs
         }
 
     except Exception as e:
@@ -256,6 +296,8 @@ def time_entry_detail(
 
 
 @router.get("/all-company-usage")
+@shaped_report
+@report_cache.single_flight("all-company-usage")
 def all_company_usage_report(
     period: str = Query(...),
     months: int = Query(6),
@@ -266,30 +308,23 @@ def all_company_usage_report(
         periods = [get_period_range(period, i) for i in range(months)]
         min_date, max_date = periods[-1][0], periods[0][1]
 
-        query = supabase.table("time_entries").select(
-            "id, hours, company_hubspot_id, start_time"
-        ).gte("start_time", min_date).lte("start_time", max_date).neq("tag", exclude_tag)
-        if entry_type:
-            query = query.eq("entry_type", entry_type)
-        entries = query.execute().data or []
-
-        company_usage = defaultdict(lambda: {
-            "period_totals": [0.0] * months,
-            "time_log_ids": [[] for _ in range(months)]
-        })
-
-        for entry in entries:
-            cid = entry.get("company_hubspot_id")
-            if not cid:
-                continue
-            dt = datetime.fromisoformat(
-                entry["start_time"]).replace(tzinfo=None)
-            for i, (start_str, end_str) in enumerate(periods):
-                if datetime.fromisoformat(start_str) <= dt <= datetime.fromisoformat(end_str):
-                    hours = float(entry.get("hours") or 0)
-                    company_usage[cid]["period_totals"][i] += hours
-                    company_usage[cid]["time_log_ids"][i].append(entry["id"])
-                    break
+        def entries_query():
+            q = supabase.table("time_entries").select(
+                "id, hours, company_hubspot_id, start_time"
+            ).neq("tag", exclude_tag)
+            if entry_type:
+                q = q.eq("entry_type", entry_type)
+            return q
+
+        # only the current window's entry ids are returned, so only those
+        # are kept while the pages stream through
+        buckets, logs = usage_buckets(
+            periods, entries_query, True, log_prefix="[all_company_usage_report]",
+            entry_type=entry_type, neq_tag=exclude_tag)
+        company_usage = {
+            cid: {"period_totals": buckets.totals(cid), "time_logs": logs.window_ids(cid)}
+            for cid in buckets.companies() if cid
+        }
 
         company_ids = list(company_usage.keys())
         if not company_ids:
@@ -320,7 +355,7 @@ def all_company_usage_report(
                 "percentage_usage": percentage_usage,
                 "missing_sla": sla == 0,
                 "company_raw": meta.get("raw"),
-                "time_logs": data["time_log_ids"][0]
+                "time_logs": data["time_logs"]
             })
 
         return result
@@ -351,6 +386,7 @@ def all_company_usage_report(
       - company_raw metadata (if requested)
     """
 )
+@report_cache.single_flight("companies-with-time")
 def companies_with_time_entries(
     start_date: str = Query(..., description="Start date (ISO, inclusive)"),
     end_date: str = Query(..., description="End date (ISO, inclusive)"),
@@ -387,19 +423,22 @@ def companies_with_time_entries(
     if entry_type:
         q = q.eq("entry_type", entry_type)
 
-    entries = q.execute().data or []
+    cols = EntryColumns.from_rows(q.execute().data or [])
 
     # 3) Aggregate by company
-    grouped = defaultdict(
-        lambda: {"time_entry_ids": [], "total_hours": 0.0, "entry_count": 0})
-    for entry in entries:
-        cid = entry.get("company_hubspot_id")
-        if not cid:
-            continue
-        hours = float(entry.get("hours") or 0)
-        grouped[cid]["time_entry_ids"].append(entry["id"])
-        grouped[cid]["total_hours"] += hours
-        grouped[cid]["entry_count"] += 1
+    has_company = cols.company > 0
+    company = cols.company[has_company]
+    order = np.argsort(company, kind="stable")
+    uniq, first = np.unique(company[order], return_index=True)
+    ids_by_company = dict(zip(
+        uniq.tolist(), np.split(cols.ids[has_company][order], first[1:])))
+    grouped = {}
+    for cid, total, count in zip(*group_sum(company, cols.hours[has_company])):
+        grouped[cid] = {
+            "time_entry_ids": ids_by_company[cid].tolist(),
+            "total_hours": total,
+            "entry_count": count,
+        }
 
     # 4) Optionally load company metadata
     company_map = {}
@@ -553,6 +592,8 @@ def companies_with_time_entries(
     "/over-sla",
     summary="List companies whose average or monthly usage exceeds SLA",
 )
+@shaped_report
+@report_cache.cached("over-sla")
 def companies_over_sla(
     period: str = Query(..., description="MM-YYYY, e.g. '06-2025'"),
     num_periods: int = Query(6, ge=1, le=12),
@@ -601,56 +642,36 @@ def companies_over_sla(
     customer_ids = list(meta.keys())
 
     # 3) Fetch all relevant time entries, paged, ordered by id
-    base_query = (
-        supabase
-        .table("time_entries")
-        .select("company_hubspot_id, hours, start_time")
-        .in_("company_hubspot_id", customer_ids)
-        .gte("start_time", oldest_start_iso)
-        .lte("start_time", newest_end_iso)
-    )
-    if exclude_tag:
-        base_query = base_query.neq("tag", exclude_tag)
-    if entry_type:
-        base_query = base_query.eq("entry_type", entry_type)
-
-    entries = fetch_all_entries(base_query, order_column="id")
-
-    # 4) Bucket per company per window, and rolling totals
-    usage_by_company = defaultdict(lambda: [0.0] * num_periods)
-    roll_6 = defaultdict(float)
-    roll_12 = defaultdict(float)
+    def entries_query():
+        q = (
+            supabase
+            .table("time_entries")
+            .select("id, company_hubspot_id, hours, start_time")
+            .in_("company_hubspot_id", customer_ids)
+        )
+        if exclude_tag:
+            q = q.neq("tag", exclude_tag)
+        if entry_type:
+            q = q.eq("entry_type", entry_type)
+        return q
 
+    # 4) Bucket per company per window, and rolling totals, page by page
     newest_end_date = isoparse(newest_end_iso).astimezone(timezone.utc).date()
     six_cutoff = newest_end_date - relativedelta(months=6)
     twelve_cutoff = newest_end_date - relativedelta(months=12)
-
-    for e in entries:
-        cid = int(e.get("company_hubspot_id", 0))
-        if cid not in meta or not e.get("start_time"):
-            continue
-
-        dt_utc = isoparse(e["start_time"]).astimezone(timezone.utc)
-        hrs = float(e.get("hours") or 0)
-
-        # assign to the correct monthly bucket
-        for idx, (start_iso, end_iso) in enumerate(windows):
-            start_dt = isoparse(start_iso)
-            end_dt = isoparse(end_iso)
-            if start_dt <= dt_utc <= end_dt:
-                usage_by_company[cid][idx] += hrs
-                break
-
-        # rolling sums
-        dt_date = dt_utc.date()
-        if dt_date >= six_cutoff:
-            roll_6[cid] += hrs
-        if dt_date >= twelve_cutoff:
-            roll_12[cid] += hrs
+    buckets, _ = usage_buckets(
+        windows, entries_query,
+        rolling={"last_6": f"{six_cutoff.isoformat()}T00:00:00+00:00",
+                 "last_12": f"{twelve_cutoff.isoformat()}T00:00:00+00:00"},
+        log_prefix="[companies_over_sla]",
+        companies=customer_ids, entry_type=entry_type,
+        neq_tag=exclude_tag if exclude_tag else ANY_TAG,
+    )
 
     # 5) Build final result list
     result = []
-    for cid, usage_list in usage_by_company.items():
+    for cid in buckets.companies():
+        usage_list = buckets.totals(cid)
         sla = meta[cid]["sla"]
         total_usage = sum(usage_list)
         average_usage = total_usage / num_periods if num_periods else 0
@@ -676,8 +697,8 @@ def companies_over_sla(
             "total_usage": total_usage,
             "average_usage": average_usage,
             "percentage_usage": pct_usage,
-            "last_6_months_usage": roll_6[cid],
-            "last_12_months_usage": roll_12[cid],
+            "last_6_months_usage": buckets.rolling("last_6", cid),
+            "last_12_months_usage": buckets.rolling("last_12", cid),
             "missing_sla": sla == 0,
             "company_raw": meta[cid]["raw"],
         })
@@ -742,6 +763,7 @@ class PayrollWithUsers(BaseModel):
     response_model=PayrollWithUsers,
     summary="Total hours per owner in a date range, plus user & owner metadata"
 )
+@report_cache.single_flight("payroll")
 def payroll_employees(
     start_date: str = Query(..., description="Start ISO date, inclusive"),
     end_date:   str = Query(..., description="End ISO date, inclusive")
@@ -757,35 +779,25 @@ def payroll_employees(
         end_dt, time(23, 59, 59, tzinfo=timezone.utc)
     )
 
-    # 1) Page through ALL matching entries from Supabase
-    all_entries = []
-    page_size = 100
-    offset = 0
-
-    while True:
-        batch = (
-            supabase
-            .table("time_entries")
-            .select("owner_id, hours")
-            .order("id", desc=False)
-            .gte("start_time", start_dt.isoformat())
-            .lte("start_time", end_of_day.isoformat())
-            .range(offset, offset + page_size - 1)
-            .execute()
-        ).data or []
-
-        if not batch:
-            break
-
-        all_entries.extend(batch)
-        offset += page_size
-
-    # 2) Sum hours per owner
-    totals = defaultdict(float)
-    for e in all_entries:
-        oid = e.get("owner_id")
-        if oid is not None:
-            totals[oid] += float(e.get("hours") or 0)
+    # 1-2) Hours per owner: summed in SQL when report_owner_hours() is
+    # installed, otherwise by paging through ALL matching entries
+    totals = aggregation.owner_hours(start_dt.isoformat(), end_of_day.isoformat())
+    if totals is None:
+        totals = defaultdict(float)
+        pages = iter_keyset_pages(
+            lambda: (
+                supabase
+                .table("time_entries")
+                .select("id, owner_id, hours")
+                .gte("start_time", start_dt.isoformat())
+                .lte("start_time", end_of_day.isoformat())
+            ),
+            log_prefix="[payroll_employees]",
+        )
+        for cols in iter_entry_columns(pages):
+            has_owner = cols.owner >= 0
+            for oid, hrs, _ in zip(*group_sum(cols.owner[has_owner], cols.hours[has_owner])):
+                totals[oid] += hrs
 
     payroll_list = [
         EmployeePayroll(owner_id=oid, totalTime=hrs,
@@ -796,7 +808,8 @@ def payroll_employees(
     owner_ids = list(totals.keys())
 
     # 3) Fetch users via HubSpot & map to OwnerMeta (unchanged)
-    all_users = fetch_all_users()
+    with rate_limit.interactive():
+        all_users = fetch_all_users()
     raw_user_map = map_owner_ids_to_users(owner_ids, all_users)
     users_map: Dict[int, Optional[User]] = {
         oid: User(
@@ -816,7 +829,7 @@ def payroll_employees(
         .execute()
     )
     meta_list = owner_meta_res.data or []
-    owner_meta_map = {m["hubspot_id"]: m for m in meta_list}
+    owner_meta_map = {int(m["hubspot_id"]): m for m in meta_list}
 
     owners_map: Dict[int, Optional[OwnerMeta]] = {}
     for oid in owner_ids:
@@ -882,10 +895,23 @@ def get_last_sync():
     return LastSyncResponse(last_sync=ts)
 
 
+@router.get(
+    "/rollup/status",
+    summary="State of the in-process daily rollup copy and the closed-period snapshots"
+)
+def rollup_status():
+    return {**daily_rollup.status(), "snapshots": period_snapshots.status(),
+            "aggregation": aggregation.status()}
+
+
 @router.get(
     "/usage-and-gaps",
     summary="All customer companies with per-period usage (includes zero-usage)"
 )
+@shaped_report
+# per-row debug sampling only happens on a real run
+@report_cache.cached("usage-and-gaps",
+                     skip=lambda kw: kw["debug"] and kw["debug_company_id"] is not None)
 def usage_and_gaps(
     period: str = Query(..., description="MM-YYYY, e.g. '06-2025'"),
     num_months: int = Query(6, ge=1, le=12),
@@ -943,101 +969,64 @@ def usage_and_gaps(
     dbg(debug, f"customers_found={len(customers)} in_meta={len(customer_ids)} contains_target={debug_company_id in meta if debug_company_id else 'n/a'}")
 
     # 3) Entries query (paged) — inclusive range, optional filters
-    base_query = (
-        supabase.table("time_entries")
-        .select("id, company_hubspot_id, hours, start_time, end_time, tag, entry_type")
-        .in_("company_hubspot_id", customer_ids)
-        .gte("start_time", oldest_start_iso)
-        .lte("start_time", newest_end_iso)
-    )
-    if exclude_tag:
-        base_query = base_query.neq("tag", exclude_tag)
-    if entry_type:
-        base_query = base_query.eq("entry_type", entry_type)
+    def entries_query():
+        q = (
+            supabase.table("time_entries")
+            .select("id, company_hubspot_id, hours, start_time, end_time, tag, entry_type")
+            .in_("company_hubspot_id", customer_ids)
+        )
+        if exclude_tag:
+            q = q.neq("tag", exclude_tag)
+        if entry_type:
+            q = q.eq("entry_type", entry_type)
+        return q
 
     dbg(debug,
         f"querying time_entries with ids={len(customer_ids)} gte={oldest_start_iso} lte={newest_end_iso}")
-    entries = fetch_all_entries(
-        base_query, order_column="id", max_retries=3, log_prefix=logpfx)
-
-    dbg(debug, f"entries_total={len(entries)}")
-
-    # 3a) Global min/max timestamps to validate range
-    if entries:
-        try:
-            mins = min(e["start_time"] for e in entries if e.get("start_time"))
-            maxs = max(e["start_time"] for e in entries if e.get("start_time"))
-            dbg(debug, f"entries_start_time_range min={mins} max={maxs}")
-        except Exception:
-            pass
-
-    # 3b) Raw per-company total from unbucketed entries for cross-check
-    raw_totals = defaultdict(float)
+    # 3a-4) One pass over the pages as they arrive: range check, raw
+    # per-company totals for cross-checking, and per-window buckets
+    # (inclusive end)
     target_rows = 0
-    for e in entries:
-        cid_raw = e.get("company_hubspot_id")
-        try:
-            cid = int(cid_raw) if cid_raw is not None else None
-        except Exception:
-            continue
-        hrs = float(e.get("hours") or 0)
-        raw_totals[cid] += hrs
-        if debug_company_id is not None and cid == debug_company_id:
-            target_rows += 1
-            if target_rows <= 10:  # sample
-                dbg(debug,
-                    f"target row id={e.get('id')} start={e.get('start_time')} hrs={hrs} tag={e.get('tag')} type={e.get('entry_type')}")
 
+    # per-row debug sampling needs the raw entries; otherwise the SQL
+    # aggregate, snapshots and the rollup will do
+    if debug and debug_company_id is not None:
+        buckets = PeriodBuckets(windows, companies=customer_ids)
+        for cols in iter_entry_columns(iter_entry_pages(
+                entries_query, order_column="id", max_retries=3, log_prefix=logpfx, windows=windows)):
+            dbg(debug, f"source=entries rows={len(cols)}")
+            buckets.add(cols)
+            for i in np.flatnonzero(cols.company == debug_company_id).tolist():
+                target_rows += 1
+                if target_rows <= 10:  # sample
+                    start = cols.start[i]
+                    dbg(debug,
+                        f"target row id={cols.ids[i]} start={epoch_us_to_iso(start) if start != NAT else None} hrs={cols.hours[i]} tag={TAGS.name(cols.tag[i])} type={ENTRY_TYPES.name(cols.entry_type[i])}")
+    else:
+        buckets, _ = usage_buckets(
+            windows, entries_query, log_prefix=logpfx,
+            companies=customer_ids, entry_type=entry_type,
+            neq_tag=exclude_tag if exclude_tag else ANY_TAG)
+
+    raw_totals = buckets.raw_totals
+    dbg(debug, f"entries_total={buckets.entries}")
+    if buckets.min_time is not None:
+        dbg(debug,
+            f"entries_start_time_range min={epoch_us_to_iso(buckets.min_time)} max={epoch_us_to_iso(buckets.max_time)}")
     if debug_company_id is not None:
         dbg(debug,
             f"target raw_total_hours={raw_totals.get(debug_company_id, 0.0)} from_rows={target_rows}")
-
-    # 4) Bucket per window (inclusive end)
-    usage_by_company = defaultdict(lambda: [0.0] * num_months)
-    parsed_windows = [(isoparse(s), isoparse(e)) for (s, e) in windows]
-
-    miss_in_meta = 0
-    not_bucketed = 0
-
-    for e in entries:
-        cid_raw = e.get("company_hubspot_id")
-        try:
-            cid = int(cid_raw) if cid_raw is not None else None
-        except Exception:
-            continue
-        if cid not in meta:
-            miss_in_meta += 1
-            continue
-
-        st = e.get("start_time")
-        if not st:
-            continue
-        dt_utc = isoparse(st).astimezone(timezone.utc)
-        hrs = float(e.get("hours") or 0)
-
-        placed = False
-        for idx, (ws, we) in enumerate(parsed_windows):
-            if ws <= dt_utc <= we:
-                usage_by_company[cid][idx] += hrs
-                placed = True
-                if debug_company_id is not None and cid == debug_company_id:
-                    dbg(debug,
-                        f"bucket company={cid} entry={e.get('id')} dt={dt_utc.isoformat()} -> idx={idx} +{hrs}")
-                break
-        if not placed:
-            not_bucketed += 1
-            if debug_company_id is not None and cid == debug_company_id:
-                dbg(debug,
-                    f"OUTSIDE WINDOWS company={cid} entry={e.get('id')} dt={dt_utc.isoformat()}")
-
+        if debug_company_id in meta:
+            dbg(debug,
+                f"target buckets={buckets.totals(debug_company_id)}")
     dbg(debug,
-        f"entries_missing_meta={miss_in_meta} entries_not_bucketed={not_bucketed}")
+        f"entries_missing_meta={buckets.missing_company} entries_not_bucketed={buckets.not_bucketed}")
 
     # 5) Build result for ALL customers
     result = []
     for cid in customer_ids:
         sla = meta[cid]["sla"]
-        usage_list = usage_by_company.get(cid, [0.0] * num_months)
+        usage_list = buckets.totals(cid)
         total_usage = sum(usage_list)
         average_usage = total_usage / num_months if num_months else 0.0
         pct_usage = (average_usage / sla * 100) if sla > 0 else None
@@ -1063,3 +1052,32 @@ def usage_and_gaps(
 
     dbg(debug, f"result_count={len(result)}")
     return result
+
+
+@router.get(
+    "/cache/status",
+    summary="Size, hit rate and data version of the report result cache"
+)
+def report_cache_status():
+    return report_cache.status()
+
+
+# ── cache warm-up ───────────────────────────────────────────────────────────
+# The dashboard opens on the previous calendar month, 6 periods, Retained
+# entries with travel time exempted; these are re-run after every sync.
+
+DASHBOARD_ENTRY_TYPE = "Retained"
+DASHBOARD_EXCLUDE_TAG = "Allowable travel time"
+
+
+def default_period() -> str:
+    prev = datetime.now(timezone.utc).date().replace(day=1) - timedelta(days=1)
+    return prev.strftime("%m-%Y")
+
+
+report_cache.register_warmup("over-sla", lambda: companies_over_sla(
+    period=default_period(), num_periods=6, filter_monthly=True,
+    entry_type=DASHBOARD_ENTRY_TYPE, exclude_tag=DASHBOARD_EXCLUDE_TAG))
+report_cache.register_warmup("usage-and-gaps", lambda: usage_and_gaps(
+    period=default_period(), num_months=6, entry_type=DASHBOARD_ENTRY_TYPE,
+    exclude_tag=DASHBOARD_EXCLUDE_TAG, debug=True, debug_company_id=None))
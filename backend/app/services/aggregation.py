@@ -0,0 +1,102 @@
+import os
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, Tuple
+from app.supabase.client import supabase
+from app.services.daily_rollup import ANY_TAG
+from app.services.period_buckets import PeriodBuckets
+
+# Report aggregation pushed down into Postgres (sql/report_aggregates.sql).
+#
+# report_period_usage() buckets time_entries into 26th→25th windows and sums
+# hours per (company, window), rolling cutoffs and raw per-company totals in
+# one statement, returning a small jsonb document instead of every entry;
+# report_owner_hours() does the same for payroll.  Callers get the result in
+# the same shape as the Python engine (PeriodBuckets / {owner: hours}) or None,
+# in which case they run the Python path (snapshots, rollup, raw scans).
+#
+# REPORT_AGGREGATION=auto (default) uses the functions when they are installed
+# and falls back quietly otherwise; "sql" makes a missing function an error
+# (useful when checking a deployment); "python" never calls them.
+
+AGGREGATION_BACKEND = os.getenv("REPORT_AGGREGATION", "auto").lower()
+USAGE_FUNCTION = "report_period_usage"
+OWNER_FUNCTION = "report_owner_hours"
+
+_missing: Set[str] = set()
+
+
+def _is_missing_function(e: Exception) -> bool:
+    code = getattr(e, "code", None)
+    text = str(e)
+    return code in ("PGRST202", "42883") or "PGRST202" in text or "Could not find the function" in text
+
+
+def _call(function: str, params: Dict) -> Optional[Any]:
+    if AGGREGATION_BACKEND == "python" or function in _missing:
+        return None
+    try:
+        return supabase.rpc(function, params).execute().data
+    except Exception as e:
+        if AGGREGATION_BACKEND == "auto" and _is_missing_function(e):
+            print(f"[Aggregation] {function}() not installed; aggregating in Python")
+            _missing.add(function)
+            return None
+        raise
+
+
+def _tag_param(neq_tag) -> Optional[str]:
+    # .neq("tag", None) on PostgREST sends the literal string "None"
+    return None if neq_tag is ANY_TAG else str(neq_tag)
+
+
+def period_usage(
+    windows: Sequence[Tuple[str, str]],
+    companies: Optional[Iterable[int]] = None,
+    entry_type: Optional[str] = None,
+    neq_tag=ANY_TAG,
+    rolling: Optional[Dict[str, str]] = None,
+    ids_for_window: Optional[int] = None,
+    by_company: bool = True,
+) -> Optional[PeriodBuckets]:
+    """
+    PeriodBuckets filled by report_period_usage(), or None if the function
+    isn't available.  Arguments mean what they do for PeriodBuckets and
+    period_columns.
+    """
+    company_ids = None if companies is None else sorted({int(c) for c in companies})
+    rolling = rolling or {}
+    data = _call(USAGE_FUNCTION, {
+        "p_starts": [s for s, _ in windows],
+        "p_ends": [e for _, e in windows],
+        "p_rolling": [rolling[n] for n in rolling],
+        "p_companies": company_ids,
+        "p_entry_type": entry_type or None,
+        "p_neq_tag": _tag_param(neq_tag),
+        "p_ids_window": ids_for_window,
+    })
+    if data is None:
+        return None
+    if isinstance(data, list):  # some clients wrap a scalar result
+        data = data[0] if data else {}
+    buckets = PeriodBuckets(windows, companies=company_ids, rolling=rolling,
+                            ids_for_window=ids_for_window, by_company=by_company)
+    buckets.add_aggregates(data or {})
+    return buckets
+
+
+def owner_hours(start_iso: str, end_iso: str) -> Optional[Dict[int, float]]:
+    """{owner_id: hours} for start_time in [start_iso, end_iso], or None."""
+    data = _call(OWNER_FUNCTION, {"p_start": start_iso, "p_end": end_iso})
+    if data is None:
+        return None
+    totals: Dict[int, float] = {}
+    for oid, hrs in data or []:
+        try:
+            key = int(oid)
+        except (TypeError, ValueError):
+            continue  # same as the Python path: unparsable owners are skipped
+        totals[key] = totals.get(key, 0.0) + float(hrs or 0)
+    return totals
+
+
+def status() -> Dict[str, Any]:
+    return {"backend": AGGREGATION_BACKEND, "missing_functions": sorted(_missing)}
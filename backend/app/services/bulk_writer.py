@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, List, Dict, Optional, Callable
+from app.supabase.client import supabase
+
+# Concurrent chunked upserts into Supabase.
+#
+#  - up to WRITE_WORKERS chunks are in flight at once; `add()` blocks once the
+#    pool is saturated so an upstream pipeline gets back-pressure
+#  - the chunk size grows while writes are fast and halves on slow writes or
+#    payload/timeout errors
+#  - a chunk that still fails after retries is bisected until the bad rows are
+#    isolated, so one bad record no longer drops its 49 neighbours
+#  - buffered records are de-duplicated on the `on_conflict` key (last one
+#    wins): ON CONFLICT DO UPDATE can't touch a row twice in one statement, so
+#    a duplicate (e.g. a record re-read at a search re-anchor) would otherwise
+#    fail its whole chunk
+#  - with SUPABASE_BULK_INGEST=1 chunks are much larger and are shipped as one
+#    NDJSON document to the `bulk_upsert` Postgres function (sql/bulk_upsert.sql),
+#    which merges them in a single statement; if the function is missing we
+#    fall back to plain PostgREST upserts
+
+WRITE_WORKERS = int(os.getenv("SUPABASE_WRITE_WORKERS", "4"))
+TARGET_LATENCY = float(os.getenv("SUPABASE_WRITE_TARGET_SECONDS", "2.0"))
+BULK_INGEST = os.getenv("SUPABASE_BULK_INGEST", "0") == "1"
+INGEST_FUNCTION = "bulk_upsert"
+INGEST_CHUNK = 1000
+INGEST_MAX_CHUNK = 10000
+
+
+def _is_payload_error(e: Exception) -> bool:
+    """Errors where a smaller request is the fix rather than a retry."""
+    code = getattr(e, "code", None)
+    text = str(e).lower()
+    return (
+        code in ("57014", "413")
+        or "statement timeout" in text
+        or "payload too large" in text
+        or "request entity too large" in text
+    )
+
+
+def _is_missing_function(e: Exception) -> bool:
+    code = getattr(e, "code", None)
+    text = str(e)
+    return code in ("PGRST202", "42883") or "PGRST202" in text or "Could not find the function" in text
+
+
+def to_ndjson(records: List[Dict]) -> str:
+    return "\n".join(json.dumps(r, separators=(",", ":"), default=str) for r in records)
+
+
+class BulkWriter:
+    def __init__(
+        self,
+        table: str,
+        on_conflict: str = "hubspot_id",
+        chunk_size: int = 50,
+        min_chunk: int = 5,
+        max_chunk: int = 500,
+        workers: int = WRITE_WORKERS,
+        max_attempts: int = 3,
+        target_latency: float = TARGET_LATENCY,
+        on_written: Optional[Callable[[int], None]] = None,
+        ingest: bool = BULK_INGEST,
+    ):
+        self.table = table
+        self.on_conflict = on_conflict
+        self.ingest = ingest
+        if ingest:
+            chunk_size = max(chunk_size, INGEST_CHUNK)
+            max_chunk = max(max_chunk, INGEST_MAX_CHUNK)
+        self.chunk_size = chunk_size
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.max_attempts = max_attempts
+        self.target_latency = target_latency
+        self.on_written = on_written
+        self.stats = {"written": 0, "failed": 0, "chunks": 0, "retries": 0}
+        self.failed_keys: List = []
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix=f"bulk-{table}")
+        self._slots = threading.BoundedSemaphore(max(1, workers) * 2)
+        self._lock = threading.Lock()
+        self._key_columns = [c.strip() for c in on_conflict.split(",")]
+        self._buffer: Dict[Any, Dict] = {}   # on_conflict key → record, in arrival order
+        self._futures = []
+        self._errors: List[BaseException] = []  # unexpected, from _write_chunk
+
+    # ── public API ──────────────────────────────────────────────────────────
+
+    def add(self, records: List[Dict]) -> None:
+        for record in records:
+            key = tuple(record.get(c) for c in self._key_columns)
+            if all(v is None for v in key):
+                key = id(record)  # no key to conflict on
+            self._buffer.pop(key, None)
+            self._buffer[key] = record
+        while len(self._buffer) >= self.chunk_size:
+            keys = list(islice(self._buffer, self.chunk_size))
+            self._submit([self._buffer.pop(k) for k in keys])
+
+    def drain(self) -> None:
+        """Write anything buffered and wait until every chunk has landed."""
+        if self._buffer:
+            chunk, self._buffer = list(self._buffer.values()), {}
+            self._submit(chunk)
+        wait(self._futures)
+        self._futures = []
+        # surface unexpected bugs (write errors are handled in _write_chunk),
+        # including those of chunks that finished and were pruned earlier
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def flush(self) -> Dict[str, int]:
+        """Drain, shut the pool down and return stats."""
+        self.drain()
+        self._pool.shutdown(wait=True)
+        print(
+            f"[BulkWriter:{self.table}] done: {self.stats} final_chunk_size={self.chunk_size}")
+        if self.failed_keys:
+            print(
+                f"[BulkWriter:{self.table}] ❌ Rows that could not be written: {self.failed_keys}")
+        return dict(self.stats)
+
+    # ── internals ───────────────────────────────────────────────────────────
+
+    def _submit(self, chunk: List[Dict]) -> None:
+        self._slots.acquire()
+        self._futures = [f for f in self._futures if not f.done()]
+        future = self._pool.submit(self._write_chunk, chunk, self.max_attempts)
+        future.add_done_callback(self._chunk_done)
+        self._futures.append(future)
+
+    def _chunk_done(self, future) -> None:
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            with self._lock:
+                self._errors.append(error)
+
+    def _adapt(self, latency: Optional[float], payload_error: bool = False) -> None:
+        with self._lock:
+            if payload_error or (latency is not None and latency > self.target_latency * 2):
+                self.chunk_size = max(self.min_chunk, self.chunk_size // 2)
+            elif latency is not None and latency < self.target_latency / 2:
+                self.chunk_size = min(
+                    self.max_chunk, self.chunk_size + max(1, self.chunk_size // 4))
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _upsert(self, chunk: List[Dict]) -> None:
+        if self.ingest:
+            columns = list(dict.fromkeys(k for r in chunk for k in r))
+            try:
+                supabase.rpc(INGEST_FUNCTION, {
+                    "target_table": self.table,
+                    "rows_ndjson": to_ndjson(chunk),
+                    "columns": columns,
+                    "conflict": self.on_conflict,
+                }).execute()
+                return
+            except Exception as e:
+                if not _is_missing_function(e):
+                    raise
+                print(
+                    f"[BulkWriter:{self.table}] ⚠️ {INGEST_FUNCTION}() not available, falling back to PostgREST upserts: {e}")
+                with self._lock:
+                    self.ingest = False
+                    self.chunk_size = min(self.chunk_size, 100)
+                    self.max_chunk = 500
+        supabase.table(self.table).upsert(
+            chunk, on_conflict=self.on_conflict).execute()
+
+    def _write_chunk(self, chunk: List[Dict], attempts: int) -> None:
+        for attempt in range(1, attempts + 1):
+            started = time.monotonic()
+            try:
+                self._upsert(chunk)
+            except Exception as e:
+                payload_error = _is_payload_error(e)
+                print(
+                    f"[BulkWriter:{self.table}]   ⚠️ {len(chunk)} rows, attempt {attempt}/{attempts} failed: {e}")
+                if payload_error:
+                    self._adapt(None, payload_error=True)
+                    break  # retrying the same payload won't help; split it
+                if attempt < attempts:
+                    self._count("retries")
+                    time.sleep(min(8.0, 0.5 * 2 ** (attempt - 1))
+                               * (0.5 + random.random()))
+                continue
+            self._adapt(time.monotonic() - started)
+            self._count("written", len(chunk))
+            self._count("chunks")
+            if self.on_written:
+                self.on_written(len(chunk))
+            return
+
+        if len(chunk) == 1:
+            self._count("failed")
+            with self._lock:
+                self.failed_keys.append(chunk[0].get(self.on_conflict))
+            return
+
+        # Isolate the bad rows: halves get a single attempt until they are
+        # down to one row, which gets the full retry budget again.
+        mid = len(chunk) // 2
+        for half in (chunk[:mid], chunk[mid:]):
+            self._write_chunk(
+                half, self.max_attempts if len(half) == 1 else 1)
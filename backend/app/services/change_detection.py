@@ -0,0 +1,82 @@
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime
+from dateutil.parser import isoparse
+from app.supabase.client import supabase
+
+# Skip HubSpot records whose last-modified timestamp matches what is already
+# stored, so unchanged rows (and their `raw` JSON) are never re-written.
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return isoparse(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def fetch_stored_versions(
+    table: str, hubspot_ids: List[int], extra_columns: Tuple[str, ...] = ()
+) -> Dict[int, Dict]:
+    """
+    Return {hubspot_id: {updated_at, *extra_columns}} for the ids that already
+    exist in `table`.
+    """
+    if not hubspot_ids:
+        return {}
+    columns = ", ".join(dict.fromkeys(("hubspot_id", "updated_at") + tuple(extra_columns)))
+    rows = (
+        supabase.table(table)
+        .select(columns)
+        .in_("hubspot_id", hubspot_ids)
+        .execute()
+    ).data or []
+    return {int(r["hubspot_id"]): r for r in rows}
+
+
+def filter_changed(
+    table: str, records: List[Dict], extra_columns: Tuple[str, ...] = (),
+    previous_columns: Tuple[str, ...] = (),
+    on_previous: Optional[Callable[[List[Dict]], None]] = None,
+    rewrite: bool = False,
+) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Split built rows into the ones that need writing and the ones that are
+    unchanged.  A row is unchanged when its `updated_at` and every column in
+    `extra_columns` (for values HubSpot can change without bumping the
+    modified date, such as associations) match the stored row.
+
+    `previous_columns` are read alongside but not compared; the stored rows
+    about to be overwritten are passed to `on_previous`.  With `rewrite` no
+    row counts as unchanged (a full sync re-writes every row, e.g. to apply a
+    new `raw` projection).
+
+    Returns (rows_to_write, {"inserted", "updated", "skipped"}).
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    if not records:
+        return [], counts
+
+    stored = fetch_stored_versions(
+        table, [r["hubspot_id"] for r in records],
+        tuple(extra_columns) + tuple(previous_columns))
+    changed = []
+    for rec in records:
+        hid = rec["hubspot_id"]
+        if hid not in stored:
+            counts["inserted"] += 1
+            changed.append(rec)
+            continue
+        old = stored[hid]
+        new_ts = _parse_ts(rec.get("updated_at"))
+        old_ts = _parse_ts(old.get("updated_at"))
+        same_extras = all(rec.get(c) == old.get(c) for c in extra_columns)
+        if not rewrite and new_ts is not None and new_ts == old_ts and same_extras:
+            counts["skipped"] += 1
+            continue
+        counts["updated"] += 1
+        changed.append(rec)
+    if on_previous is not None:
+        on_previous([stored[r["hubspot_id"]] for r in changed if r["hubspot_id"] in stored])
+    return changed, counts
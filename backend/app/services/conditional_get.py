@@ -0,0 +1,68 @@
+import hashlib
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from app.services.report_cache import report_cache
+
+# Conditional GETs for data read from Supabase.
+#
+# GETs under ETAG_PREFIXES get an ETag derived from the path, the (sorted)
+# query parameters and report_cache's data version (which follows deletes and
+# other processes' syncs through database-side change markers) — nothing in
+# the response body is hashed, so a request whose If-None-Match still matches is answered
+# 304 before the endpoint runs.  `Cache-Control: no-cache` makes browsers and
+# the Electron shell keep the body and revalidate it on every load.
+#
+# Paths whose output depends on more than Supabase data (payroll pulls users
+# from HubSpot) or is live state (status endpoints) are left alone.
+
+ETAG_PREFIXES = ("/reports/", "/companies", "/time-entries")
+ETAG_EXCLUDED = ("/reports/payroll/",)
+
+
+def _wants_etag(request: Request) -> bool:
+    path = request.url.path
+    return (request.method in ("GET", "HEAD")
+            and path.startswith(ETAG_PREFIXES)
+            and not path.startswith(ETAG_EXCLUDED)
+            and not path.endswith("/status"))
+
+
+def etag_for(request: Request) -> Optional[str]:
+    version = report_cache.version()
+    if version is None:
+        return None
+    query = urlencode(sorted(parse_qsl(request.url.query, keep_blank_values=True)))
+    digest = hashlib.sha1(
+        f"{request.url.path}?{query}#{version}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    # weak comparison: W/"x" and "x" are the same validator
+    bare = etag[2:]
+    return "*" in tags or etag in tags or bare in tags
+
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if not _wants_etag(request):
+            return await call_next(request)
+        etag = await run_in_threadpool(etag_for, request)  # may query Supabase
+        if etag is None:
+            return await call_next(request)
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
@@ -0,0 +1,191 @@
+import os
+import time
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from dateutil.parser import isoparse
+from app.supabase.client import supabase
+from app.services.entry_columns import (
+    ENTRY_TYPES, NAT, TAGS, EntryColumns, to_ids)
+from app.services.pagination import iter_keyset_pages
+
+# In-process copy of the `time_entry_daily` rollup (sql/time_entry_daily.sql).
+#
+# The table is kept current by triggers on time_entries, so every sync or
+# webhook write updates it by the delta of the rows it touched.  This module
+# mirrors it in memory: the first read loads it, later reads pull only the
+# rollup rows whose updated_at moved since the previous read (re-reading
+# ROLLUP_OVERLAP to cover transactions that committed late) and patch them in.
+# Syncs call mark_stale() after writing time entries so the next report
+# refreshes straight away instead of waiting for ROLLUP_REFRESH_SECONDS.
+#
+# Reports that need only daily totals per company/owner/entry_type/tag read
+# select(), which returns matching rollup rows as EntryColumns (one "entry" per
+# day and key, timed at the day's UTC midnight) for PeriodBuckets.  If the
+# table isn't installed, select() returns None and reports scan time_entries.
+
+ROLLUP_ENABLED = os.getenv("REPORT_ROLLUP", "1") == "1"
+ROLLUP_TABLE = "time_entry_daily"
+ROLLUP_REFRESH_SECONDS = float(os.getenv("REPORT_ROLLUP_REFRESH_SECONDS", "30"))
+ROLLUP_OVERLAP = timedelta(minutes=5)
+ROLLUP_COLUMNS = "id, day, company_hubspot_id, owner_id, entry_type, tag, hours, entries, updated_at"
+
+# (day, company, owner, entry_type, tag)
+RollupKey = Tuple[str, Optional[int], Optional[str], Optional[str], Optional[str]]
+
+# select(neq_tag=ANY_TAG): no tag filter at all
+ANY_TAG = object()
+_US_PER_DAY = 86_400_000_000
+
+
+def _is_missing_table(e: Exception) -> bool:
+    code = getattr(e, "code", None)
+    text = str(e)
+    return (code in ("PGRST205", "42P01") or "PGRST205" in text
+            or "Could not find the table" in text
+            or ("relation" in text and "does not exist" in text))
+
+
+def _day_us(day: str) -> int:
+    return (date.fromisoformat(day[:10]).toordinal() - date(1970, 1, 1).toordinal()) * _US_PER_DAY
+
+
+class DailyRollup:
+    def __init__(self, table: str = ROLLUP_TABLE):
+        self.table = table
+        self._rows: Dict[RollupKey, Tuple[float, int]] = {}
+        self._watermark: Optional[datetime] = None
+        self._day_updated: Dict[str, datetime] = {}
+        self._checked = 0.0
+        self._stale = True
+        self._available: Optional[bool] = None
+        self._columns: Optional[EntryColumns] = None
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "refreshes": 0, "rows_pulled": 0}
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    # ── refresh ─────────────────────────────────────────────────────────────
+
+    def _pull(self) -> None:
+        since = self._watermark - ROLLUP_OVERLAP if self._watermark else None
+
+        def make_query():
+            q = supabase.table(self.table).select(ROLLUP_COLUMNS)
+            if since is not None:
+                q = q.gte("updated_at", since.isoformat())
+            return q
+
+        pulled = 0
+        for page in iter_keyset_pages(make_query, key="id", log_prefix="[DailyRollup]"):
+            pulled += len(page)
+            for r in page:
+                key = (r["day"][:10], r.get("company_hubspot_id"), r.get("owner_id"),
+                       r.get("entry_type"), r.get("tag"))
+                if int(r.get("entries") or 0) > 0:
+                    self._rows[key] = (float(r.get("hours") or 0), int(r["entries"]))
+                else:
+                    self._rows.pop(key, None)
+                ts = isoparse(r["updated_at"])
+                if self._watermark is None or ts > self._watermark:
+                    self._watermark = ts
+                if key[0] not in self._day_updated or ts > self._day_updated[key[0]]:
+                    self._day_updated[key[0]] = ts
+        self.stats["loads" if since is None else "refreshes"] += 1
+        self.stats["rows_pulled"] += pulled
+        if pulled:
+            self._columns = None
+
+    def refresh(self) -> bool:
+        """Bring the copy up to date if due; returns whether the rollup is usable."""
+        if not ROLLUP_ENABLED or self._available is False:
+            return False
+        with self._lock:
+            due = self._stale or time.monotonic() - self._checked >= ROLLUP_REFRESH_SECONDS
+            if not due:
+                return True
+            self._stale = False
+            try:
+                self._pull()
+            except Exception as e:
+                if _is_missing_table(e):
+                    print(f"[DailyRollup] {self.table} not installed; reports scan time_entries")
+                    self._available = False
+                    return False
+                self._stale = True
+                raise
+            self._available = True
+            self._checked = time.monotonic()
+            return True
+
+    # ── reads ───────────────────────────────────────────────────────────────
+
+    def _as_columns(self) -> EntryColumns:
+        if self._columns is None:
+            keys = sorted(self._rows, key=lambda k: (k[0], k[1] if k[1] is not None else -1))
+            n = len(keys)
+            values = [self._rows[k] for k in keys]
+            self._columns = EntryColumns(
+                ids=np.full(n, None, dtype=object),
+                start=np.array([_day_us(k[0]) for k in keys], dtype=np.int64),
+                end=np.full(n, NAT, dtype=np.int64),
+                hours=np.array([h for h, _ in values], dtype=np.float64),
+                company=to_ids(k[1] for k in keys),
+                owner=to_ids(k[2] for k in keys),
+                tag=TAGS.codes(k[4] for k in keys),
+                entry_type=ENTRY_TYPES.codes(k[3] for k in keys),
+            )
+        return self._columns
+
+    def select(
+        self,
+        start_iso: str,
+        end_iso: str,
+        companies: Optional[Iterable[int]] = None,
+        entry_type: Optional[str] = None,
+        neq_tag=ANY_TAG,
+    ) -> Optional[EntryColumns]:
+        """
+        Rollup rows for days start_iso..end_iso (inclusive, by date), or None
+        if the rollup isn't available.  `entry_type` and `neq_tag` filter like
+        .eq("entry_type", …) / .neq("tag", …) on time_entries would — in
+        particular a NULL tag never passes a neq filter.
+        """
+        if not self.refresh():
+            return None
+        with self._lock:
+            cols = self._as_columns()
+        keep = (cols.start >= _day_us(start_iso)) & (cols.start <= _day_us(end_iso))
+        if companies is not None:
+            keep &= np.isin(cols.company, np.array([int(c) for c in companies], dtype=np.int64))
+        if entry_type:
+            keep &= cols.entry_type == ENTRY_TYPES.code(entry_type)
+        if neq_tag is not ANY_TAG:
+            keep &= (cols.tag >= 0) & (cols.tag != TAGS.code(str(neq_tag)))
+        sel = np.flatnonzero(keep)
+        return EntryColumns(*(getattr(cols, f)[sel] for f in EntryColumns.__slots__))
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """Newest rollup updated_at seen (database clock)."""
+        return self._watermark
+
+    def changed_since(self, start_iso: str, end_iso: str, as_of: datetime) -> bool:
+        """Whether any rollup row for days start_iso..end_iso moved after `as_of`."""
+        start, end = start_iso[:10], end_iso[:10]
+        with self._lock:  # _pull() may be patching _day_updated
+            return any(start <= day <= end and ts > as_of
+                       for day, ts in self._day_updated.items())
+
+    def status(self) -> Dict:
+        return {
+            "available": self._available,
+            "rows": len(self._rows),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            **self.stats,
+        }
+
+
+daily_rollup = DailyRollup()
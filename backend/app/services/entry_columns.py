@@ -0,0 +1,178 @@
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from dateutil.parser import isoparse
+
+# Columnar (struct-of-arrays) form of fetched time_entries pages.
+#
+# A page of PostgREST rows is a list of dicts with string timestamps; reports
+# convert each page once into typed arrays and work on those:
+#
+#   start / end   int64 microseconds since the epoch (UTC), NAT when missing
+#   hours         float64
+#   company/owner int64 ids, NO_ID when missing, BAD_ID when unparseable
+#   tag/type      int32 codes into process-wide Categories, -1 when missing
+#   ids           object array (entry ids are only needed for "logs")
+#
+# Timestamps are parsed in bulk by numpy; only strings with a non-UTC offset
+# or an unusual layout fall back to datetime.fromisoformat / dateutil.
+
+NAT = np.iinfo(np.int64).min
+NO_ID = -1
+BAD_ID = -2
+
+_UTC_SUFFIXES = ("+00:00", "Z", "+00")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _slow_epoch_us(value: str) -> int:
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        dt = isoparse(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def to_epoch_us(values: Sequence[Optional[str]]) -> np.ndarray:
+    """ISO-8601 strings → int64 microseconds since the epoch (UTC); NAT for None/''."""
+    out = np.full(len(values), NAT, dtype=np.int64)
+    fast_idx: List[int] = []
+    fast_vals: List[str] = []
+    slow: List[Tuple[int, str]] = []
+    for i, v in enumerate(values):
+        if not v:
+            continue
+        for suffix in _UTC_SUFFIXES:
+            if v.endswith(suffix):
+                fast_idx.append(i)
+                fast_vals.append(v[:-len(suffix)])
+                break
+        else:
+            slow.append((i, v))
+
+    if fast_vals:
+        try:
+            out[fast_idx] = np.array(fast_vals, dtype="datetime64[us]").astype(np.int64)
+        except ValueError:
+            slow.extend(zip(fast_idx, (values[i] for i in fast_idx)))
+    for i, v in slow:
+        out[i] = _slow_epoch_us(v)
+    return out
+
+
+def epoch_us_to_iso(value: int) -> str:
+    return f"{np.datetime64(int(value), 'us')}+00:00"
+
+
+def to_ids(values: Iterable) -> np.ndarray:
+    """Company/owner ids → int64, NO_ID for None and BAD_ID for junk."""
+    out = []
+    for v in values:
+        if v is None or v == "":
+            out.append(NO_ID)
+            continue
+        try:
+            out.append(int(v))
+        except (TypeError, ValueError):
+            out.append(BAD_ID)
+    return np.array(out, dtype=np.int64)
+
+
+class Categories:
+    """Append-only string → code table shared by every page of a process."""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.names)
+                    self.names.append(value)
+                    self._codes[value] = code
+        return code
+
+    def codes(self, values: Iterable[Optional[str]]) -> np.ndarray:
+        return np.array([self.code(v) for v in values], dtype=np.int32)
+
+    def name(self, code: int) -> Optional[str]:
+        return self.names[code] if code >= 0 else None
+
+
+TAGS = Categories()
+ENTRY_TYPES = Categories()
+
+
+class EntryColumns:
+    __slots__ = ("ids", "start", "end", "hours", "company", "owner", "tag", "entry_type")
+
+    def __init__(self, ids, start, end, hours, company, owner, tag, entry_type):
+        self.ids = ids
+        self.start = start
+        self.end = end
+        self.hours = hours
+        self.company = company
+        self.owner = owner
+        self.tag = tag
+        self.entry_type = entry_type
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict]) -> "EntryColumns":
+        """Convert one page of time_entries rows; absent columns become sentinels."""
+        ids = np.empty(len(rows), dtype=object)
+        ids[:] = [r.get("id") for r in rows]
+        return cls(
+            ids=ids,
+            start=to_epoch_us([r.get("start_time") for r in rows]),
+            end=to_epoch_us([r.get("end_time") for r in rows]),
+            hours=np.array([float(r.get("hours") or 0) for r in rows], dtype=np.float64),
+            company=to_ids(r.get("company_hubspot_id") for r in rows),
+            owner=to_ids(r.get("owner_id") for r in rows),
+            tag=TAGS.codes(r.get("tag") for r in rows),
+            entry_type=ENTRY_TYPES.codes(r.get("entry_type") for r in rows),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["EntryColumns"]) -> "EntryColumns":
+        if not parts:
+            return cls.from_rows([])
+        return cls(*(np.concatenate([getattr(p, f) for p in parts]) for f in cls.__slots__))
+
+    def __len__(self) -> int:
+        return len(self.hours)
+
+    @property
+    def nbytes(self) -> int:
+        """Array storage (entry id objects themselves not included)."""
+        return sum(getattr(self, f).nbytes for f in self.__slots__)
+
+
+def iter_entry_columns(pages: Iterable[List[Dict]]) -> Iterator[EntryColumns]:
+    """Convert pages as they stream in, so the dicts can be dropped right away."""
+    for page in pages:
+        yield EntryColumns.from_rows(page)
+
+
+def group_sum(keys: np.ndarray, weights: np.ndarray) -> Tuple[List[int], List[float], List[int]]:
+    """
+    Per-key (sum, count) of `weights`, keys in first-seen order.
+    """
+    if not len(keys):
+        return [], [], []
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = np.bincount(inverse, weights=weights, minlength=len(uniq))
+    counts = np.bincount(inverse, minlength=len(uniq))
+    order = np.argsort(first, kind="stable")
+    return uniq[order].tolist(), sums[order].tolist(), counts[order].tolist()
@@ -1,21 +1,42 @@
 import os
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Callable, Tuple
 from supabase import Client
 from app.supabase.client import supabase
+from app.core.config import (
+    HUBSPOT_BASE_URL, HUBSPOT_HEADERS, SEARCH_PAGE_LIMIT, SEARCH_RESULT_CAP,
+    HUBSPOT_TIME_ENTRY_SHARDS, HUBSPOT_HISTORY_START, HUBSPOT_SCHEMA_TTL_SECONDS,
+    HUBSPOT_COMPANY_EXTRA_PROPERTIES, HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES)
+from app.services import hubspot_async
+from app.services.sync_state import (
+    get_watermark, set_watermark, get_checkpoint, save_checkpoint, clear_checkpoint)
+from app.services.sync_pipeline import run_pipeline
+from app.services.bulk_writer import BulkWriter
+from app.services.daily_rollup import daily_rollup
+from app.services.period_snapshots import period_snapshots, days_of
+from app.services.report_cache import report_cache
+from app.services.change_detection import filter_changed, fetch_stored_versions
+from app.services.sync_progress import SyncProgress, NULL_PROGRESS
+from app.services.rate_limit import GovernedSession
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import isoparse
 import time
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 
-HUBSPOT_API_KEY = os.getenv("HUBSPOT_API_KEY")
-BASE_URL = "https://api.hubapi.com"
-session = requests.Session()
+BASE_URL = HUBSPOT_BASE_URL
+HEADERS = HUBSPOT_HEADERS
+# Every call is paced by the shared rate governor, which also handles 429s;
+# urllib3 only retries transient server errors.
+session = GovernedSession()
 retry_strategy = Retry(
     total=5,
     backoff_factor=1,
-    status_forcelist=[429, 500, 502, 503, 504],
+    status_forcelist=[500, 502, 503, 504],
     allowed_methods=["GET", "POST"],
     raise_on_status=False,
 )
@@ -23,10 +44,13 @@ adapter = HTTPAdapter(max_retries=retry_strategy)
 session.mount("https://", adapter)
 session.mount("http://", adapter)
 
-HEADERS = {
-    "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-    "Content-Type": "application/json"
-}
+TIME_ENTRY_OBJECT_TYPE = "p25086185_time_entries"  # fullyQualifiedName from payload
+COMPANY_OBJECT_TYPE = "companies"
+
+# Incremental sync settings.  The CRM search index lags writes slightly, so we
+# re-read a small overlap before the stored watermark; upserts are idempotent.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+CHECKPOINT_EVERY_PAGES = 10  # pages between resumable sync checkpoints
 
 
 def as_float(v, default=0.0):
@@ -47,81 +71,194 @@ def as_int(v, default=0, mode="round"):
     return int(round(x))
 
 
-def fetch_all_companies(limit: int = 100) -> List[Dict]:
-    print("[fetch_all_companies] Starting fetch_all_companies with limit =", limit)
-    property_names = get_company_property_names()
-    print("[fetch_all_companies] Using properties:", property_names)
-    url = f"{BASE_URL}/crm/v3/objects/companies"
-    params = {"limit": limit, "properties": ",".join(property_names)}
-    results = []
+class HubSpotPage(list):
+    """
+    One page of HubSpot results plus the cursor that fetches the page after
+    it (None on the last page), so a sync can checkpoint and resume.
+    """
+
+    def __init__(self, items, cursor: Optional[Dict] = None):
+        super().__init__(items)
+        self.cursor = cursor
+
+
+def _iter_list_pages(object_type: str, params: Dict, cursor: Optional[Dict] = None,
+                     log_prefix: str = "[iter_list_pages]") -> Iterator[HubSpotPage]:
+    url = f"{BASE_URL}/crm/v3/objects/{object_type}"
+    if cursor and cursor.get("after"):
+        print(f"{log_prefix} Resuming after cursor {cursor['after']}")
+        params = {**params, "after": cursor["after"]}
     page = 1
+    total = 0
 
     while url:
-        print(
-            f"[fetch_all_companies] Fetching page {page}: {url} with params {params}")
+        print(f"{log_prefix} Fetching page {page}: {url}")
         res = session.get(url, headers=HEADERS, params=params)
         res.raise_for_status()
         data = res.json()
         batch = data.get("results", [])
-        results.extend(batch)
+        total += len(batch)
         print(
-            f"[fetch_all_companies]   → Retrieved {len(batch)} records (total so far: {len(results)})")
+            f"{log_prefix}   → Retrieved {len(batch)} records (total so far: {total})")
+        nxt = data.get("paging", {}).get("next", {})
+        yield HubSpotPage(batch, {"after": nxt["after"]} if nxt.get("after") else None)
 
-        url = data.get("paging", {}).get("next", {}).get("link")
+        url = nxt.get("link")
         params = {}  # clear params for subsequent pages
         page += 1
 
-    print(
-        f"[fetch_all_companies] Completed fetch: {len(results)} total records")
-    return results
+    print(f"{log_prefix} Completed fetch: {total} total records")
+
+
+def iter_company_pages(limit: int = 100, cursor: Optional[Dict] = None) -> Iterator[HubSpotPage]:
+    """
+    Yield HubSpot companies one page at a time (list endpoint).
+    """
+    property_names = get_company_property_names()
+    params = {"limit": limit, "properties": ",".join(property_names)}
+    return _iter_list_pages(COMPANY_OBJECT_TYPE, params, cursor, "[iter_company_pages]")
+
+
+def fetch_all_companies(limit: int = 100) -> List[Dict]:
+    return [c for page in iter_company_pages(limit) for c in page]
+
+
+# Properties mapped onto `time_entries` columns by build_time_entry_record.
+TIME_ENTRY_PROPERTIES = [
+    "start_time",
+    "end_time",
+    "time_spent___hours",
+    "time_spent___minutes",
+    "entry_type",
+    "description",
+    "tag",
+    "hubspot_owner_id",
+    "hs_createdate",
+    "hs_lastmodifieddate",
+]
+
+# Properties mapped onto `hubspot_companies` columns by build_company_record.
+COMPANY_PROPERTIES = [
+    "name",
+    "domain",
+    "client_code",
+    "industry",
+    "region",
+    "type",
+    "status",
+    "contract_start_date",
+    "contract_end_date",
+    "contract_term__months_",
+    "annual_charge",
+    "hours_per_month",
+    "income_per_month",
+    "off_boarded",
+    "original_clover_start_date",
+    "off_boarding_date",
+    "contract_status",
+    "lifecyclestage",
+    "hubspot_owner_id"
+]
+
+# Keys the frontend and PDF template read from `company_raw`; kept in `raw`
+# even when empty so they stay present (null) rather than undefined.
+COMPANY_RAW_REQUIRED = ("name", "income_per_month")
+
+_schema_cache: Dict[str, Tuple[float, List[str]]] = {}
+_schema_lock = threading.Lock()
+
+
+def get_schema_property_names(schema_id: str) -> List[str]:
+    """
+    Property names defined on a custom object schema, cached for
+    HUBSPOT_SCHEMA_TTL_SECONDS so syncs don't re-read the schema every run.
+    """
+    with _schema_lock:
+        cached = _schema_cache.get(schema_id)
+        if cached and time.monotonic() - cached[0] < HUBSPOT_SCHEMA_TTL_SECONDS:
+            return cached[1]
+
+        url = f"{BASE_URL}/crm/v3/schemas/{schema_id}"
+        print(f"[get_schema_property_names] GET {url}")
+        res = session.get(url, headers=HEADERS)
+        res.raise_for_status()
+        names = [prop["name"] for prop in res.json().get("properties", [])]
+        print(
+            f"[get_schema_property_names] Fetched {len(names)} properties from schema {schema_id}.")
+        _schema_cache[schema_id] = (time.monotonic(), names)
+        return names
 
 
 def get_time_entry_property_names() -> List[str]:
-    print("[get_time_entry_property_names] Fetching time entry schema properties")
+    """
+    Time-entry properties to request: the mapped columns plus the configured
+    extras (HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES, "*" for the whole schema).
+    Extras unknown to the schema are dropped.
+    """
     schema_id = "2-142987565"  # objectTypeId found in your payload
-    url = f"{BASE_URL}/crm/v3/schemas/{schema_id}"
-    print(f"[get_time_entry_property_names] GET {url}")
-    res = session.get(url, headers=HEADERS)
-    res.raise_for_status()
-    data = res.json()
-    props = data.get("properties", [])
-    print(
-        f"[get_time_entry_property_names] Fetched {len(props)} properties from schema.")
-    return [prop["name"] for prop in props]
+    extras = HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES
+    if not extras:
+        return list(TIME_ENTRY_PROPERTIES)
+    try:
+        schema = get_schema_property_names(schema_id)
+    except Exception as e:
+        print(
+            f"[get_time_entry_property_names] ⚠️ Schema lookup failed, using mapped properties only: {e}")
+        return list(TIME_ENTRY_PROPERTIES)
+    if "*" in extras:
+        return list(dict.fromkeys(TIME_ENTRY_PROPERTIES + schema))
+    unknown = [p for p in extras if p not in schema]
+    if unknown:
+        print(
+            f"[get_time_entry_property_names] ⚠️ Ignoring properties not in schema: {unknown}")
+    return list(dict.fromkeys(TIME_ENTRY_PROPERTIES + [p for p in extras if p in schema]))
 
 
 def get_company_property_names() -> List[str]:
-    print("[get_company_property_names] Returning hard-coded company property list")
-    #     url = f"{BASE_URL}/crm/v3/properties/companies"
-    #     res = requests.get(url, headers=HEADERS)
-    #     res.raise_for_status()
-    #     data = res.json()
-    #     print(
-    #         f"Fetched {len(data.get('results', []))} company properties from HubSpot.")
-    #     return [prop["name"] for prop in data.get("results", [])]
-    props = [
-        "name",
-        "domain",
-        "client_code",
-        "industry",
-        "region",
-        "type",
-        "status",
-        "contract_start_date",
-        "contract_end_date",
-        "contract_term__months_",
-        "annual_charge",
-        "hours_per_month",
-        "income_per_month",
-        "off_boarded",
-        "original_clover_start_date",
-        "off_boarding_date",
-        "contract_status",
-        "lifecyclestage",
-        "hubspot_owner_id"
-    ]
-    print(f"[get_company_property_names] Property names: {props}")
-    return props
+    return list(dict.fromkeys(COMPANY_PROPERTIES + HUBSPOT_COMPANY_EXTRA_PROPERTIES))
+
+
+def slim_raw(props: Dict, allowed: List[str], required: Tuple[str, ...] = ()) -> Dict:
+    """
+    The `raw` column: projected properties only, without empty values
+    (HubSpot returns every requested property, mostly as null).
+    """
+    raw = {k: props[k] for k in allowed if props.get(k) not in (None, "")}
+    for k in required:
+        raw.setdefault(k, props.get(k))
+    return raw
+
+
+def build_company_record(company: Dict) -> Dict:
+    """
+    Map a HubSpot company object onto a `hubspot_companies` row.
+    """
+    props = company.get("properties", {})
+    return {
+        "hubspot_id": int(company["id"]),
+        "name": props.get("name"),
+        "domain": props.get("domain"),
+        "client_code": props.get("client_code"),
+        "industry": props.get("industry"),
+        "region": props.get("region"),
+        "type": props.get("type"),
+        "status": props.get("status"),
+        "contract_term__months_": int(props.get("contract_term__months_")) if props.get("contract_term__months_") else None,
+        "annual_charge": float(props.get("annual_charge") or 0),
+        "hours_per_month": float(props.get("hours_per_month") or 0),
+        "income_per_month": float(props.get("income_per_month") or 0),
+        "off_boarded": props.get("off_boarded") == "true",
+        "contract_status": props.get("contract_status"),
+        "lifecycle_stage": props.get("lifecyclestage"),
+        "owner_id": props.get("hubspot_owner_id"),
+        "created_at": company.get("createdAt"),
+        "updated_at": company.get("updatedAt"),
+        "contract_start_date": props.get("contract_start_date") or None,
+        "contract_end_date": props.get("contract_end_date") or None,
+        "original_clover_start_date": props.get("original_clover_start_date") or None,
+        "off_boarding_date": props.get("off_boarding_date") or None,
+        "raw": slim_raw(props, get_company_property_names(), COMPANY_RAW_REQUIRED)
+    }
 
 
 def upsert_companies_to_supabase(companies: List[Dict]) -> None:
@@ -132,51 +269,27 @@ def upsert_companies_to_supabase(companies: List[Dict]) -> None:
     for idx, company in enumerate(companies, start=1):
         print(
             f"[upsert_companies_to_supabase] Processing company {idx}/{len(companies)}: ID {company.get('id')}")
-        props = company.get("properties", {})
-
-        record = {
-            "hubspot_id": int(company["id"]),
-            "name": props.get("name"),
-            "domain": props.get("domain"),
-            "client_code": props.get("client_code"),
-            "industry": props.get("industry"),
-            "region": props.get("region"),
-            "type": props.get("type"),
-            "status": props.get("status"),
-            "contract_term__months_": int(props.get("contract_term__months_")) if props.get("contract_term__months_") else None,
-            "annual_charge": float(props.get("annual_charge") or 0),
-            "hours_per_month": float(props.get("hours_per_month") or 0),
-            "income_per_month": float(props.get("income_per_month") or 0),
-            "off_boarded": props.get("off_boarded") == "true",
-            "contract_status": props.get("contract_status"),
-            "lifecycle_stage": props.get("lifecyclestage"),
-            "owner_id": props.get("hubspot_owner_id"),
-            "created_at": company.get("createdAt"),
-            "updated_at": company.get("updatedAt"),
-            "contract_start_date": props.get("contract_start_date") or None,
-            "contract_end_date": props.get("contract_end_date") or None,
-            "original_clover_start_date": props.get("original_clover_start_date") or None,
-            "off_boarding_date": props.get("off_boarding_date") or None,
-            "raw": props
-        }
-
-        batch.append(record)
+        batch.append(build_company_record(company))
 
     print(
         f"[upsert_companies_to_supabase] Total records prepared: {len(batch)}")
-    # Chunk to avoid payload limits
-    chunk_size = 100
-    for i in range(0, len(batch), chunk_size):
-        chunk = batch[i:i + chunk_size]
-        print(
-            f"[upsert_companies_to_supabase] Upserting chunk {i // chunk_size + 1} ({len(chunk)} records)")
-        supabase.table("hubspot_companies").upsert(
-            chunk, on_conflict="hubspot_id"
-        ).execute()
-
+    write_company_records(batch)
     print("[upsert_companies_to_supabase] Upsert complete.")
 
 
+def write_company_records(records: List[Dict]) -> Dict[str, int]:
+    """
+    Upsert already-built `hubspot_companies` rows through a concurrent BulkWriter.
+    """
+    writer = company_writer()
+    writer.add(records)
+    return writer.flush()
+
+
+def company_writer(progress: SyncProgress = NULL_PROGRESS) -> BulkWriter:
+    return BulkWriter("hubspot_companies", chunk_size=100, on_written=progress.written)
+
+
 def map_owner_ids_to_users(
     owner_ids: List[int], users: List[Dict]
 ) -> Dict[int, Optional[Dict]]:
@@ -292,36 +405,51 @@ def fetch_all_users(limit: int = 100) -> List[Dict]:
     return users
 
 
-def fetch_all_time_entries(limit: int = 100) -> List[Dict]:
-    print("[fetch_all_time_entries] Starting fetch_all_time_entries with limit =", limit)
+def iter_time_entry_pages(limit: int = 100, cursor: Optional[Dict] = None) -> Iterator[HubSpotPage]:
+    """
+    Yield HubSpot time entries (with company associations) one page at a time.
+    """
     property_names = get_time_entry_property_names()
-    print("[fetch_all_time_entries] Using properties:", property_names)
-    object_type = "p25086185_time_entries"  # your fullyQualifiedName from payload
-    url = f"{BASE_URL}/crm/v3/objects/{object_type}"
     params = {
         "limit": limit,
         "properties": ",".join(property_names),
         "associations": "company"
     }
-    results = []
-    page = 1
+    return _iter_list_pages(TIME_ENTRY_OBJECT_TYPE, params, cursor, "[iter_time_entry_pages]")
 
-    while url:
-        print(
-            f"[fetch_all_time_entries] Fetching page {page}: {url} with params {params}")
-        res = session.get(url, headers=HEADERS, params=params)
-        res.raise_for_status()
-        data = res.json()
-        batch = data.get("results", [])
-        print(f"[fetch_all_time_entries]   → Retrieved {len(batch)} records")
-        results.extend(batch)
-        url = data.get("paging", {}).get("next", {}).get("link", None)
-        params = {}
-        page += 1
 
-    print(
-        f"[fetch_all_time_entries] Completed fetch: {len(results)} total records")
-    return results
+def fetch_all_time_entries(limit: int = 100) -> List[Dict]:
+    return [e for page in iter_time_entry_pages(limit) for e in page]
+
+
+def _time_entry_raw_keys(props: Dict) -> List[str]:
+    if "*" in HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES:
+        return list(props)
+    return TIME_ENTRY_PROPERTIES + HUBSPOT_TIME_ENTRY_EXTRA_PROPERTIES
+
+
+def build_time_entry_record(entry: Dict) -> Dict:
+    """
+    Map a HubSpot time-entry object onto a `time_entries` row.
+    """
+    props = entry.get("properties", {})
+    return {
+        "hubspot_id": int(entry["id"]),
+        "company_hubspot_id": int(entry["associations"]["companies"]["results"][0]["id"])
+        if entry.get("associations", {}).get("companies", {}).get("results") else None,
+        "start_time": props.get("start_time"),
+        "end_time": props.get("end_time"),
+        "hours": as_float(props.get("time_spent___hours")),
+        "minutes": as_int(props.get("time_spent___minutes"), mode="round"),
+        "entry_type": props.get("entry_type"),
+        "description": props.get("description"),
+        "tag": props.get("tag"),
+        "owner_id": props.get("hubspot_owner_id"),
+        "created_at": props.get("hs_createdate"),
+        "updated_at": props.get("hs_lastmodifieddate"),
+        "source": "HubSpot",
+        "raw": slim_raw(props, _time_entry_raw_keys(props))
+    }
 
 
 def upsert_time_entries_to_supabase(entries: List[Dict]) -> None:
@@ -330,7 +458,6 @@ def upsert_time_entries_to_supabase(entries: List[Dict]) -> None:
     batch = []
 
     for idx, entry in enumerate(entries, start=1):
-        props = entry.get("properties", {})
         print(
             f"[upsert_time_entries_to_supabase] Processing entry {idx}/{len(entries)}: ID {entry.get('id')}")
 
@@ -338,76 +465,585 @@ def upsert_time_entries_to_supabase(entries: List[Dict]) -> None:
             print(
                 f"[upsert_time_entries_to_supabase] Associations for entry {entry['id']}: {entry['associations']}")
 
-        record = {
-            "hubspot_id": int(entry["id"]),
-            "company_hubspot_id": int(entry["associations"]["companies"]["results"][0]["id"])
-            if entry.get("associations", {}).get("companies", {}).get("results") else None,
-            "start_time": props.get("start_time"),
-            "end_time": props.get("end_time"),
-            "hours": as_float(props.get("time_spent___hours")),
-            "minutes": as_int(props.get("time_spent___minutes"), mode="round"),
-            "entry_type": props.get("entry_type"),
-            "description": props.get("description"),
-            "tag": props.get("tag"),
-            "owner_id": props.get("hubspot_owner_id"),
-            "created_at": props.get("hs_createdate"),
-            "updated_at": props.get("hs_lastmodifieddate"),
-            "source": "HubSpot",
-            "raw": props
-        }
-        batch.append(record)
+        batch.append(build_time_entry_record(entry))
 
     print(
         f"[upsert_time_entries_to_supabase] Total records prepared: {len(batch)}")
+    write_time_entry_records(batch)
+    print("[upsert_time_entries_to_supabase] Upsert complete.")
 
-    def _upsert_chunk(chunk: List[Dict]):
-        attempts = 0
-        while attempts < 3:
-            try:
-                supabase.table("time_entries").upsert(
-                    chunk, on_conflict="hubspot_id").execute()
-                print(
-                    f"[upsert_time_entries_to_supabase]   → Successfully upserted {len(chunk)} records")
-                return
-            except Exception as e:
-                attempts += 1
-                print(
-                    f"[upsert_time_entries_to_supabase]   ⚠️ Attempt {attempts} failed: {e}")
-                time.sleep(attempts * 2)
-        print(
-            f"[upsert_time_entries_to_supabase]   ❌ Giving up on chunk of {len(chunk)} records after 3 attempts")
 
-    chunk_size = 50
-    for i in range(0, len(batch), chunk_size):
-        chunk = batch[i: i + chunk_size]
+def write_time_entry_records(records: List[Dict]) -> Dict[str, int]:
+    """
+    Upsert already-built `time_entries` rows through a concurrent BulkWriter.
+    """
+    writer = time_entry_writer()
+    writer.add(records)
+    return writer.flush()
+
+
+def time_entry_writer(progress: SyncProgress = NULL_PROGRESS) -> BulkWriter:
+    return BulkWriter("time_entries", chunk_size=50, on_written=progress.written)
+
+
+def _iso_to_ms(value: str) -> int:
+    return int(isoparse(value).astimezone(timezone.utc).timestamp() * 1000)
+
+
+def _latest_modified(objects: List[Dict], current: Optional[str] = None) -> Optional[str]:
+    """
+    Return the newest `updatedAt` among `objects`, or `current` if none is newer.
+    """
+    latest = current
+    latest_dt = isoparse(current) if current else None
+    for obj in objects:
+        ts = obj.get("updatedAt") or obj.get(
+            "properties", {}).get("hs_lastmodifieddate")
+        if not ts:
+            continue
+        dt = isoparse(ts)
+        if latest_dt is None or dt > latest_dt:
+            latest, latest_dt = ts, dt
+    return latest
+
+
+def iter_search_pages(
+    object_type: str, property_names: List[str], since_iso: str, limit: int = SEARCH_PAGE_LIMIT,
+    progress: SyncProgress = NULL_PROGRESS, cursor: Optional[Dict] = None
+) -> Iterator[HubSpotPage]:
+    """
+    Yield pages of every object of `object_type` whose hs_lastmodifieddate is
+    at or after `since_iso`, via the CRM search endpoint.
+
+    Search cannot page past SEARCH_RESULT_CAP results, so when the cursor gets
+    close we re-anchor the filter on the newest modification date seen so far.
+    Re-anchoring can repeat a few objects; downstream upserts are idempotent.
+    """
+    url = f"{BASE_URL}/crm/v3/objects/{object_type}/search"
+    since_ms = _iso_to_ms(since_iso)
+    after = None
+    if cursor:
+        print(f"[iter_search_pages] Resuming from cursor {cursor}")
+        since_ms, after = int(cursor["since_ms"]), cursor.get("after")
+    page = 1
+    total = 0
+
+    while True:
+        body = {
+            "filterGroups": [{"filters": [{
+                "propertyName": "hs_lastmodifieddate",
+                "operator": "GTE",
+                "value": str(since_ms),
+            }]}],
+            "sorts": [{"propertyName": "hs_lastmodifieddate", "direction": "ASCENDING"}],
+            "properties": property_names,
+            "limit": limit,
+        }
+        if after:
+            body["after"] = after
+        print(
+            f"[iter_search_pages] {object_type} page {page} since_ms={since_ms} after={after}")
+        res = session.post(url, headers=HEADERS, json=body)
+        res.raise_for_status()
+        data = res.json()
+        batch = data.get("results", [])
+        if page == 1 and "total" in data:
+            progress.expect(int(data["total"]))
+        total += len(batch)
         print(
-            f"[upsert_time_entries_to_supabase] Upserting chunk {i // chunk_size + 1} ({len(chunk)} records)")
-        _upsert_chunk(chunk)
+            f"[iter_search_pages]   → Retrieved {len(batch)} records (total so far: {total})")
 
-    print("[upsert_time_entries_to_supabase] Upsert complete.")
+        after = data.get("paging", {}).get("next", {}).get("after")
+        page += 1
+        next_cursor = {"since_ms": since_ms, "after": after} if after else None
+        if after and int(after) + limit >= SEARCH_RESULT_CAP:
+            newest = _latest_modified(batch)
+            next_ms = _iso_to_ms(newest) if newest else since_ms
+            if next_ms <= since_ms:
+                print(
+                    "[iter_search_pages] ⚠️ Result cap hit without advancing; stopping early")
+                next_cursor = None
+            else:
+                next_cursor = {"since_ms": next_ms, "after": None}
+
+        yield HubSpotPage(batch, next_cursor)
+        if next_cursor is None:
+            break
+        since_ms, after = next_cursor["since_ms"], next_cursor["after"]
 
 
-def sync_all_data():
-    print("[sync_all_data] Starting full sync")
-    print("[sync_all_data] Fetching HubSpot companies...")
-    companies = fetch_all_companies()
-    upsert_companies_to_supabase(companies)
+def search_modified_since(
+    object_type: str, property_names: List[str], since_iso: str, limit: int = SEARCH_PAGE_LIMIT
+) -> List[Dict]:
+    found: Dict[str, Dict] = {}
+    for page in iter_search_pages(object_type, property_names, since_iso, limit):
+        for obj in page:
+            found[obj["id"]] = obj
+    return list(found.values())
 
-    print("[sync_all_data] Fetching Time Entries...")
-    time_entries = fetch_all_time_entries()
+
+def fetch_company_associations(object_type: str, ids: List[str], chunk_size: int = 100) -> Dict[str, List[str]]:
+    """
+    Batch-read object → company associations (the search endpoint does not
+    return associations).  Returns {object_id: [company_id, ...]}.
+    """
+    url = f"{BASE_URL}/crm/v4/associations/{object_type}/companies/batch/read"
+    mapping: Dict[str, List[str]] = {}
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        res = session.post(url, headers=HEADERS, json={
+                           "inputs": [{"id": str(x)} for x in chunk]})
+        # 207 = partial success (objects without associations are reported as errors)
+        if res.status_code not in (200, 207):
+            res.raise_for_status()
+        for row in res.json().get("results", []):
+            mapping[str(row["from"]["id"])] = [
+                str(t["toObjectId"]) for t in row.get("to", [])]
     print(
-        f"[sync_all_data] Fetched {len(time_entries)} time entries. Upserting...")
-    upsert_time_entries_to_supabase(time_entries)
+        f"[fetch_company_associations] Resolved associations for {len(mapping)}/{len(ids)} objects")
+    return mapping
 
-    print("✅ HubSpot sync complete.")
 
+def attach_company_associations(object_type: str, objects: List[Dict]) -> None:
+    """
+    Give searched objects the same `associations.companies.results` shape the
+    list endpoint returns, so build_*_record works unchanged.
+    """
+    if not objects:
+        return
+    assoc = fetch_company_associations(object_type, [o["id"] for o in objects])
+    for obj in objects:
+        company_ids = assoc.get(str(obj["id"]), [])
+        if company_ids:
+            obj["associations"] = {"companies": {
+                "results": [{"id": cid} for cid in company_ids]}}
+
+
+def fetch_archived_ids(object_type: str, since_iso: Optional[str] = None, limit: int = 100) -> List[int]:
+    """
+    List archived (deleted) objects, optionally only those archived at or after
+    `since_iso`.  These are applied as tombstones on our side.
+
+    With `since_iso` paging stops at the first page archived entirely before
+    it, as long as the archive has come back newest-first so far; if any
+    record is newer than the one before it the order can't be relied on and
+    the whole archive is read.  Full syncs (no `since_iso`) always read it all.
+    """
+    url = f"{BASE_URL}/crm/v3/objects/{object_type}"
+    params = {"limit": limit, "archived": "true"}
+    since_dt = isoparse(since_iso) if since_iso else None
+    ids: List[int] = []
+    newest_first = True
+    previous = None
+    pages = 0
+
+    while url:
+        res = session.get(url, headers=HEADERS, params=params)
+        res.raise_for_status()
+        data = res.json()
+        pages += 1
+        results = data.get("results", [])
+        page_is_old = bool(results)
+        for obj in results:
+            archived_at = obj.get("archivedAt")
+            archived_dt = isoparse(archived_at) if archived_at else None
+            if archived_dt is None:
+                newest_first = page_is_old = False
+            else:
+                if previous is not None and archived_dt > previous:
+                    newest_first = False
+                previous = archived_dt
+            if since_dt and archived_dt and archived_dt < since_dt:
+                continue
+            page_is_old = False
+            ids.append(int(obj["id"]))
+        if since_dt and newest_first and page_is_old:
+            break  # everything after this page was archived even earlier
+        url = data.get("paging", {}).get("next", {}).get("link")
+        params = {}
 
-def time_sync():
-    print("[time_sync] Starting time sync")
-    print("[time_sync] Fetching Time Entries...")
-    time_entries = fetch_all_time_entries()
     print(
-        f"[time_sync] Fetched {len(time_entries)} time entries. Upserting...")
-    upsert_time_entries_to_supabase(time_entries)
+        f"[fetch_archived_ids] {object_type}: {len(ids)} archived since {since_iso or 'forever'} ({pages} pages)")
+    return ids
+
+
+def delete_tombstones(table: str, hubspot_ids: List[int], chunk_size: int = 100,
+                      on_deleted: Optional[Callable[[List[Dict]], None]] = None) -> int:
+    deleted = 0
+    for i in range(0, len(hubspot_ids), chunk_size):
+        chunk = hubspot_ids[i:i + chunk_size]
+        res = supabase.table(table).delete().in_("hubspot_id", chunk).execute()
+        deleted += len(res.data or [])
+        if on_deleted is not None and res.data:
+            on_deleted(res.data)
+    if deleted:
+        print(f"[delete_tombstones] Removed {deleted} archived rows from {table}")
+    return deleted
+
+
+def batch_read_objects(object_type: str, ids: List[str], property_names: List[str],
+                       chunk_size: int = 100) -> List[Dict]:
+    """
+    Fetch specific objects by id (batch-read API).  Ids that no longer exist
+    are reported by HubSpot as errors and simply left out of the result.
+    """
+    url = f"{BASE_URL}/crm/v3/objects/{object_type}/batch/read"
+    found: List[Dict] = []
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        res = session.post(url, headers=HEADERS, json={
+            "properties": property_names,
+            "inputs": [{"id": str(x)} for x in chunk],
+        })
+        # 207 = partial success (some ids not found)
+        if res.status_code not in (200, 207):
+            res.raise_for_status()
+        found.extend(res.json().get("results", []))
+    print(
+        f"[batch_read_objects] {object_type}: read {len(found)}/{len(ids)} objects")
+    return found
+
+
+def _time_entries_changed(days) -> None:
+    """Tell the report caches that time entries on these UTC days changed."""
+    daily_rollup.mark_stale()
+    period_snapshots.invalidate_days(days)
+
+
+def _search_since(watermark: str) -> str:
+    return (isoparse(watermark) - WATERMARK_OVERLAP).isoformat()
+
+
+def _new_sync_stats() -> Dict[str, int]:
+    return {"fetched": 0, "inserted": 0, "updated": 0, "skipped": 0,
+            "written": 0, "failed": 0, "deleted": 0}
+
+
+def _merge_counts(stats: Dict[str, int], counts: Dict[str, int]) -> None:
+    for key, value in counts.items():
+        stats[key] = stats.get(key, 0) + value
+
+
+def _sync_object(
+    object_type: str,
+    table: str,
+    phase: str,
+    full: bool,
+    progress: SyncProgress,
+    list_pages: Callable[..., Iterator[HubSpotPage]],
+    property_names: Callable[[], List[str]],
+    build: Callable[[Dict], Dict],
+    writer_factory: Callable[[SyncProgress], BulkWriter],
+    extra_columns: Tuple[str, ...] = (),
+    needs_associations: bool = False,
+    shards: int = 1,
+) -> Dict[str, int]:
+    """
+    Shared incremental/full, change-detecting, checkpointed sync of one
+    HubSpot object type into `table`.  A requested full sync (`full`) skips
+    change detection and re-writes every row, so existing rows pick up the
+    current property projection and `raw` slimming.
+
+    With `shards` > 1 the object is fetched as that many date-range shards in
+    parallel through the async client (on hs_lastmodifieddate for incremental
+    runs, hs_createdate for full ones); otherwise pages are walked serially.
+
+    The writer is drained and the position saved every CHECKPOINT_EVERY_PAGES
+    pages and (sharded) whenever a shard completes; a sharded position is each
+    unfinished shard's lower bound moved up to the newest value it has
+    written.  A failed or interrupted run then resumes from what is known to be
+    in Supabase instead of starting over.
+    """
+    progress = progress.phase(phase)
+    watermark = None if full else get_watermark(object_type)
+    mode = "incremental" if watermark else "full"
+    since = _search_since(watermark) if watermark else None
+    sharded = shards > 1
 
-    print("✅ HubSpot time sync complete.")
+    checkpoint = get_checkpoint(object_type)
+    if checkpoint and (checkpoint.get("mode") != mode or checkpoint.get("since") != since
+                       or bool(checkpoint.get("sharded")) != sharded):
+        print(
+            f"[{table}] Ignoring checkpoint from a different {checkpoint.get('mode')} run")
+        checkpoint = None
+    cursor = checkpoint.get("cursor") if checkpoint else None
+    stats = dict(checkpoint.get("stats") or {}) if checkpoint else {}
+    stats = {**_new_sync_stats(), **stats}
+    prior_written, prior_failed = stats["written"], stats["failed"]
+    latest = {"value": checkpoint.get(
+        "latest", watermark) if checkpoint else watermark}
+    if checkpoint:
+        print(
+            f"[{table}] Resuming {mode} sync from checkpoint ({stats['fetched']} records already done)")
+
+    if sharded:
+        if cursor:
+            shard_plan = [tuple(s) for s in cursor["shards"]]
+            shards_done = set(cursor["done"])
+        elif watermark:
+            shard_plan = hubspot_async.plan_shards(_iso_to_ms(since), shards)
+            shards_done = set()
+        else:
+            shard_plan = hubspot_async.plan_shards(
+                _iso_to_ms(HUBSPOT_HISTORY_START), shards, open_below=True)
+            shards_done = set()
+        resume_plan = list(shard_plan)  # lower bounds advance as shards progress
+        partition_property = "hs_lastmodifieddate" if watermark else "hs_createdate"
+        print(
+            f"[{table}] {mode.capitalize()} sync in {len(shard_plan)} parallel shards on {partition_property}")
+        pages = (
+            HubSpotPage(batch, shard_cursor)
+            for batch, shard_cursor in hubspot_async.iter_sharded_pages(
+                object_type, property_names(), partition_property, shard_plan,
+                shards_done, with_associations=needs_associations)
+        )
+    elif watermark:
+        print(f"[{table}] Incremental sync since {watermark}")
+        pages = iter_search_pages(object_type, property_names(), since,
+                                  progress=progress, cursor=cursor)
+    else:
+        print(f"[{table}] Full sync (no watermark or full requested)")
+        pages = list_pages(cursor=cursor)
+
+    # UTC days of time entries written or deleted (old and new start_time),
+    # for the report caches
+    tracks_days = table == "time_entries"
+    touched_days = set()
+
+    def note_days(rows: List[Dict]) -> None:
+        touched_days.update(days_of(r.get("start_time") for r in rows))
+
+    def transform(page: HubSpotPage) -> HubSpotPage:
+        if needs_associations and watermark and not sharded:
+            attach_company_associations(object_type, page)
+        progress.fetched(len(page))
+        changed, counts = filter_changed(
+            table, [build(o) for o in page], extra_columns,
+            previous_columns=("start_time",) if tracks_days else (),
+            on_previous=note_days if tracks_days else None, rewrite=full)
+        if tracks_days:
+            note_days(changed)
+        progress.skipped(counts["skipped"])
+        out = HubSpotPage(changed, page.cursor)
+        out.fetched, out.counts = len(page), counts
+        out.latest = _latest_modified(page)
+        return out
+
+    writer = writer_factory(progress)
+    pages_done = 0
+
+    def save(position: Dict) -> None:
+        writer.drain()
+        save_checkpoint(object_type, {
+            "mode": mode,
+            "since": since,
+            "sharded": sharded,
+            "cursor": position,
+            "latest": latest["value"],
+            "stats": {**stats,
+                      "written": prior_written + writer.stats["written"],
+                      "failed": prior_failed + writer.stats["failed"]},
+        })
+
+    def sink(page: HubSpotPage) -> None:
+        nonlocal pages_done
+        writer.add(page)
+        stats["fetched"] += page.fetched
+        _merge_counts(stats, page.counts)
+        latest["value"] = _latest_modified(
+            [{"updatedAt": page.latest}] if page.latest else [], latest["value"])
+        pages_done += 1
+        if sharded:
+            idx = page.cursor["shard"]
+            if page.cursor["complete"]:
+                shards_done.add(idx)
+            elif page.cursor.get("lo") is not None:
+                resume_plan[idx] = (page.cursor["lo"], resume_plan[idx][1])
+            if page.cursor["complete"] or pages_done % CHECKPOINT_EVERY_PAGES == 0:
+                save({"shards": resume_plan, "done": sorted(shards_done)})
+        elif page.cursor and pages_done % CHECKPOINT_EVERY_PAGES == 0:
+            save(page.cursor)
+
+    try:
+        run_pipeline(pages, transform, sink, name=f"sync_{table}")
+    except BaseException:
+        # land what was fetched, but let the pipeline error be the one raised
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"[{table}] ⚠️ Could not flush writes after the failure: {e}")
+        raise
+    written = writer.flush()
+    stats["written"] = prior_written + written["written"]
+    stats["failed"] = prior_failed + written["failed"]
+    if written["failed"]:
+        progress.error(f"{written['failed']} rows could not be written")
+
+    clear_checkpoint(object_type)
+    stats["deleted"] = delete_tombstones(
+        table, fetch_archived_ids(object_type, since),
+        on_deleted=note_days if tracks_days else None)
+    if tracks_days and (written["written"] or stats["deleted"]):
+        _time_entries_changed(touched_days)
+    if stats["failed"]:
+        # rows that didn't land would fall behind a newer watermark and never
+        # be fetched again; keep the old one so the next run re-reads them
+        # (change detection skips the rows that did land)
+        print(
+            f"[{table}] ⚠️ {stats['failed']} rows failed; keeping watermark {watermark}")
+    else:
+        set_watermark(object_type, latest["value"])
+    progress.done()
+    print(f"[{table}] {stats}")
+    return stats
+
+
+def sync_companies(full: bool = False, progress: SyncProgress = NULL_PROGRESS) -> Dict[str, int]:
+    """
+    Sync HubSpot companies.  Incremental (search on hs_lastmodifieddate past
+    the stored watermark) unless `full` is set or no watermark exists yet.
+    Pages are streamed straight into Supabase and rows whose updatedAt is
+    already stored are skipped.  Returns inserted/updated/skipped counts.
+    """
+    return _sync_object(
+        COMPANY_OBJECT_TYPE, "hubspot_companies", "companies", full, progress,
+        list_pages=iter_company_pages,
+        property_names=get_company_property_names,
+        build=build_company_record,
+        writer_factory=company_writer,
+    )
+
+
+def sync_time_entries(full: bool = False, progress: SyncProgress = NULL_PROGRESS) -> Dict[str, int]:
+    """
+    Sync HubSpot time entries; same incremental/full and change-detection
+    semantics as sync_companies.  Returns inserted/updated/skipped counts.
+    """
+    return _sync_object(
+        TIME_ENTRY_OBJECT_TYPE, "time_entries", "time_entries", full, progress,
+        list_pages=iter_time_entry_pages,
+        property_names=get_time_entry_property_names,
+        build=build_time_entry_record,
+        writer_factory=time_entry_writer,
+        # association changes don't always bump hs_lastmodifieddate
+        extra_columns=("company_hubspot_id",),
+        needs_associations=True,
+        shards=HUBSPOT_TIME_ENTRY_SHARDS,
+    )
+
+
+# Tables and mappers used to apply individual object changes (webhooks).
+SYNCED_OBJECTS = {
+    COMPANY_OBJECT_TYPE: {
+        "table": "hubspot_companies",
+        "property_names": get_company_property_names,
+        "build": build_company_record,
+        "writer_factory": company_writer,
+        "needs_associations": False,
+    },
+    TIME_ENTRY_OBJECT_TYPE: {
+        "table": "time_entries",
+        "property_names": get_time_entry_property_names,
+        "build": build_time_entry_record,
+        "writer_factory": time_entry_writer,
+        "needs_associations": True,
+    },
+}
+
+
+def apply_object_changes(object_type: str, changed_ids: List[str], deleted_ids: List[str]) -> Dict[str, int]:
+    """
+    Re-read `changed_ids` from HubSpot and upsert them, and delete
+    `deleted_ids`.  Ids that have vanished by the time we read them are
+    treated as deletions.
+    """
+    spec = SYNCED_OBJECTS[object_type]
+    stats = {"fetched": 0, "written": 0, "failed": 0, "deleted": 0}
+    gone = {int(x) for x in deleted_ids}
+    tracks_days = spec["table"] == "time_entries"
+    touched_days = set()
+
+    def note_days(rows: List[Dict]) -> None:
+        touched_days.update(days_of(r.get("start_time") for r in rows))
+
+    if changed_ids:
+        objects = batch_read_objects(
+            object_type, changed_ids, spec["property_names"]())
+        if spec["needs_associations"]:
+            attach_company_associations(object_type, objects)
+        stats["fetched"] = len(objects)
+        read = {int(o["id"]) for o in objects}
+        gone |= {int(x) for x in changed_ids} - read
+
+        records = [spec["build"](o) for o in objects]
+        if tracks_days:
+            note_days(records)
+            note_days(list(fetch_stored_versions(
+                spec["table"], sorted(read), ("start_time",)).values()))
+        writer = spec["writer_factory"](NULL_PROGRESS)
+        writer.add(records)
+        written = writer.flush()
+        stats["written"], stats["failed"] = written["written"], written["failed"]
+
+    if gone:
+        stats["deleted"] = delete_tombstones(
+            spec["table"], sorted(gone), on_deleted=note_days if tracks_days else None)
+    if tracks_days and (stats["written"] or stats["deleted"]):
+        _time_entries_changed(touched_days)
+    if stats["written"] or stats["deleted"]:
+        report_cache.invalidate(f"{spec['table']} webhook changes")
+    print(f"[apply_object_changes] {spec['table']}: {stats}")
+    return stats
+
+
+def refresh_owners() -> Dict[str, int]:
+    users = fetch_all_users()
+    return {"fetched": len(users)}
+
+
+def sync_all_data(full: bool = False, progress: SyncProgress = NULL_PROGRESS) -> Dict[str, Dict[str, int]]:
+    """
+    Sync companies, owners and time entries concurrently; each object has its
+    own pipeline, so wall-clock is bounded by the slowest one rather than the
+    sum.  Raises the first failure once all three have finished.
+    """
+    print(f"[sync_all_data] Starting {'full' if full else 'incremental'} sync")
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="sync_all") as pool:
+        futures = {
+            "companies": pool.submit(sync_companies, full, progress),
+            "owners": pool.submit(refresh_owners),
+            "time_entries": pool.submit(sync_time_entries, full, progress),
+        }
+        wait(futures.values())
+
+    errors = [f.exception() for f in futures.values() if f.exception()]
+    if errors:
+        raise errors[0]
+    result = {name: f.result() for name, f in futures.items()}
+    print(f"✅ HubSpot sync complete. {result}")
+    return result
+
+
+def time_sync(full: bool = False, progress: SyncProgress = NULL_PROGRESS) -> Dict[str, Dict[str, int]]:
+    print(f"[time_sync] Starting {'full' if full else 'incremental'} time sync")
+    entries = sync_time_entries(full=full, progress=progress)
+
+    print(f"✅ HubSpot time sync complete. time_entries={entries}")
+    return {"time_entries": entries}
+
+
+def company_sync(full: bool = False, progress: SyncProgress = NULL_PROGRESS) -> Dict[str, Dict[str, int]]:
+    return {"companies": sync_companies(full=full, progress=progress)}
+
+
+def owner_sync(full: bool = False, progress: SyncProgress = NULL_PROGRESS) -> Dict[str, Dict[str, int]]:
+    return {"owners": refresh_owners()}
+
+
+# sync_jobs kind → the function that runs it
+SYNC_TARGETS = {
+    "full": sync_all_data,
+    "time": time_sync,
+    "companies": company_sync,
+    "owners": owner_sync,
+}
@@ -0,0 +1,249 @@
+import asyncio
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+import httpx
+from dateutil.parser import isoparse
+from app.services.rate_limit import governors_for
+from app.core.config import (
+    HUBSPOT_BASE_URL, HUBSPOT_HEADERS, HUBSPOT_CONCURRENCY,
+    SEARCH_PAGE_LIMIT, SEARCH_RESULT_CAP)
+
+# asyncio HubSpot client.  One pooled keep-alive httpx.AsyncClient per run with
+# at most `concurrency` requests in flight, used to fetch date-range shards of
+# an object in parallel.  The blocking sync pipeline consumes the result
+# through iter_sharded_pages(), which runs the event loop on its own thread.
+
+RETRY_STATUSES = {500, 502, 503, 504}  # 429s are paced by the rate governor
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0
+
+Shard = Tuple[Optional[int], Optional[int]]  # [lo, hi) epoch ms; None = open
+
+
+def _to_ms(value: str) -> int:
+    return int(isoparse(value).astimezone(timezone.utc).timestamp() * 1000)
+
+
+class AsyncHubSpotClient:
+    def __init__(self, concurrency: int = HUBSPOT_CONCURRENCY, timeout: float = 30.0):
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._client = httpx.AsyncClient(
+            base_url=HUBSPOT_BASE_URL,
+            headers=HUBSPOT_HEADERS,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max(1, concurrency),
+                                max_keepalive_connections=max(1, concurrency)),
+        )
+
+    async def __aenter__(self) -> "AsyncHubSpotClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._client.aclose()
+
+    async def request(self, method: str, url: str, **kwargs) -> Dict:
+        governors = governors_for(url)
+        for attempt in range(MAX_RETRIES + 1):
+            async with self._sem:
+                for g in governors:
+                    while True:
+                        delay = g.reserve()
+                        if delay <= 0:
+                            break
+                        await asyncio.sleep(delay)
+                res = await self._client.request(method, url, **kwargs)
+            for g in governors:
+                g.observe(res.headers, res.status_code)
+            if res.status_code == 429 and attempt < MAX_RETRIES:
+                continue  # the governor has drained the bucket for the back-off
+            if res.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                delay = BACKOFF_FACTOR * (2 ** attempt)
+                print(
+                    f"[AsyncHubSpotClient] {res.status_code} on {url}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            # 207 = batch partial success
+            if res.status_code not in (200, 207):
+                res.raise_for_status()
+            return res.json()
+        raise RuntimeError("unreachable")
+
+    async def iter_search(
+        self, object_type: str, properties: List[str], partition_property: str,
+        lo: Optional[int], hi: Optional[int], limit: int = SEARCH_PAGE_LIMIT
+    ) -> AsyncIterator[Tuple[List[Dict], bool]]:
+        """
+        Yield (batch, is_last) for objects whose `partition_property` lies in
+        [lo, hi), sorted on that property and re-anchored before the search
+        result cap, as hubspot.iter_search_pages does.
+        """
+        url = f"/crm/v3/objects/{object_type}/search"
+        props = list(dict.fromkeys(properties + [partition_property]))
+        after = None
+        while True:
+            filters = []
+            if lo is not None:
+                filters.append({"propertyName": partition_property,
+                               "operator": "GTE", "value": str(lo)})
+            if hi is not None:
+                filters.append({"propertyName": partition_property,
+                               "operator": "LT", "value": str(hi)})
+            body = {
+                "filterGroups": [{"filters": filters}] if filters else [],
+                "sorts": [{"propertyName": partition_property, "direction": "ASCENDING"}],
+                "properties": props,
+                "limit": limit,
+            }
+            if after:
+                body["after"] = after
+            data = await self.request("POST", url, json=body)
+            batch = data.get("results", [])
+
+            after = data.get("paging", {}).get("next", {}).get("after")
+            if after and int(after) + limit >= SEARCH_RESULT_CAP:
+                values = [_to_ms(o["properties"][partition_property]) for o in batch
+                          if o.get("properties", {}).get(partition_property)]
+                newest = max(values) if values else None
+                if newest is None or (lo is not None and newest <= lo):
+                    print(
+                        f"[AsyncHubSpotClient] ⚠️ Result cap hit without advancing in shard [{lo}, {hi}); stopping early")
+                    after = None
+                else:
+                    lo, after = newest, None
+                    yield batch, False
+                    continue
+            yield batch, not after
+            if not after:
+                return
+
+    async def company_associations(self, object_type: str, ids: List[str]) -> Dict[str, List[str]]:
+        if not ids:
+            return {}
+        data = await self.request(
+            "POST", f"/crm/v4/associations/{object_type}/companies/batch/read",
+            json={"inputs": [{"id": str(x)} for x in ids]})
+        return {
+            str(row["from"]["id"]): [str(t["toObjectId"]) for t in row.get("to", [])]
+            for row in data.get("results", [])
+        }
+
+    async def attach_company_associations(self, object_type: str, objects: List[Dict]) -> None:
+        assoc = await self.company_associations(object_type, [o["id"] for o in objects])
+        for obj in objects:
+            company_ids = assoc.get(str(obj["id"]), [])
+            if company_ids:
+                obj["associations"] = {"companies": {
+                    "results": [{"id": cid} for cid in company_ids]}}
+
+
+def plan_shards(start_ms: int, shards: int, open_below: bool = False,
+                end_ms: Optional[int] = None) -> List[Shard]:
+    """
+    Split [start_ms, now) into `shards` contiguous ranges.  The last range is
+    always open above (objects keep arriving while we fetch) and the first is
+    open below when `open_below` is set, so a full sync misses nothing older
+    than the planning edge.
+    """
+    end_ms = end_ms or int(datetime.now(timezone.utc).timestamp() * 1000)
+    shards = max(1, shards) if start_ms < end_ms else 1
+    step = max(1, (end_ms - start_ms) // shards)
+    bounds: List[Optional[int]] = [start_ms + i * step for i in range(shards)]
+    bounds.append(None)
+    if open_below:
+        bounds[0] = None
+    return [(bounds[i], bounds[i + 1]) for i in range(shards)]
+
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iter_sharded_pages(
+    object_type: str,
+    properties: List[str],
+    partition_property: str,
+    shards: List[Shard],
+    done: Set[int] = frozenset(),
+    with_associations: bool = False,
+    concurrency: int = HUBSPOT_CONCURRENCY,
+    max_pending: int = 8,
+) -> Iterator[Tuple[List[Dict], Dict]]:
+    """
+    Fetch every shard not in `done` concurrently and yield
+    (batch, {"shard": idx, "complete": is_last_page_of_shard, "lo": reached})
+    as pages arrive, where `reached` is the newest partition value fetched in
+    that shard so far: pages come sorted on it, so re-running the shard from
+    `reached` (inclusive) misses nothing that wasn't yielded.  A bounded queue
+    keeps the fetchers from running ahead of the consumer.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    async def _put(item) -> None:
+        while not stop.is_set():
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.05)
+
+    async def _shard(client: AsyncHubSpotClient, idx: int, lo, hi) -> None:
+        pages = 0
+        reached = lo
+        async for batch, last in client.iter_search(object_type, properties, partition_property, lo, hi):
+            if stop.is_set():
+                return
+            if with_associations and batch:
+                await client.attach_company_associations(object_type, batch)
+            pages += 1
+            values = [_to_ms(o["properties"][partition_property]) for o in batch
+                      if o.get("properties", {}).get(partition_property)]
+            if values and (reached is None or max(values) > reached):
+                reached = max(values)
+            await _put((batch, {"shard": idx, "complete": last, "lo": reached}))
+        print(f"[iter_sharded_pages] shard {idx} [{lo}, {hi}) done in {pages} pages")
+
+    async def _main() -> None:
+        async with AsyncHubSpotClient(concurrency) as client:
+            await asyncio.gather(*[
+                _shard(client, idx, lo, hi)
+                for idx, (lo, hi) in enumerate(shards) if idx not in done
+            ])
+
+    def _run() -> None:
+        try:
+            asyncio.run(_main())
+        except BaseException as e:
+            _put_blocking(_Failure(e))
+            return
+        _put_blocking(_DONE)
+
+    def _put_blocking(item) -> None:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    print(
+        f"[iter_sharded_pages] {object_type}: {len(shards) - len(done)}/{len(shards)} shards on {partition_property}, concurrency={concurrency}")
+    thread = threading.Thread(
+        target=_run, name=f"hubspot-async-{object_type}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,188 @@
+import hmac
+import time
+import base64
+import hashlib
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import HUBSPOT_CLIENT_SECRET, HUBSPOT_WEBHOOK_FLUSH_SECONDS
+from app.services import hubspot
+
+# HubSpot webhook deliveries → object upserts/deletes.
+#
+# Deliveries are verified (v3 signature), reduced to "changed" and "deleted"
+# ids per object type, and collected for HUBSPOT_WEBHOOK_FLUSH_SECONDS so a
+# burst of edits costs one batch-read per object type instead of one call per
+# event.  The flush runs on a background thread; the endpoint answers at once
+# because HubSpot retries slow deliveries.
+
+MAX_TIMESTAMP_SKEW_MS = 5 * 60 * 1000
+MAX_BATCH = 100  # batch-read accepts up to 100 ids per call
+
+# objectTypeId → the object type name our sync code uses
+OBJECT_TYPE_IDS = {
+    "0-2": hubspot.COMPANY_OBJECT_TYPE,
+    "2-142987565": hubspot.TIME_ENTRY_OBJECT_TYPE,
+}
+# legacy subscription prefixes that don't carry an objectTypeId
+SUBSCRIPTION_PREFIXES = {"company": hubspot.COMPANY_OBJECT_TYPE}
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+def sign(method: str, uri: str, body: bytes, timestamp: str,
+         secret: Optional[str] = HUBSPOT_CLIENT_SECRET) -> str:
+    """
+    The v3 signature HubSpot sends for a delivery; also handy for replaying
+    recorded payloads against a local instance.
+    """
+    message = method.encode() + uri.encode() + body + timestamp.encode()
+    return base64.b64encode(
+        hmac.new(secret.encode(), message, hashlib.sha256).digest()).decode()
+
+
+def verify_signature(method: str, uri: str, body: bytes, timestamp: Optional[str],
+                     signature: Optional[str], secret: Optional[str] = HUBSPOT_CLIENT_SECRET,
+                     now_ms: Optional[int] = None) -> None:
+    """
+    Check the X-HubSpot-Signature-v3 / X-HubSpot-Request-Timestamp headers
+    of a delivery.  Raises InvalidSignature.
+    """
+    if not secret:
+        raise InvalidSignature("HUBSPOT_CLIENT_SECRET is not configured")
+    if not signature or not timestamp:
+        raise InvalidSignature("Missing signature headers")
+    try:
+        ts = int(timestamp)
+    except ValueError:
+        raise InvalidSignature("Malformed timestamp")
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    if abs(now_ms - ts) > MAX_TIMESTAMP_SKEW_MS:
+        raise InvalidSignature("Stale timestamp")
+
+    if not hmac.compare_digest(sign(method, uri, body, timestamp, secret), signature):
+        raise InvalidSignature("Signature mismatch")
+
+
+def _event_changes(event: Dict) -> List[Tuple[str, str, str]]:
+    """Reduce one event to [(object_type, object_id, "changed" | "deleted")]."""
+    sub = event.get("subscriptionType", "")
+    prefix, _, action = sub.partition(".")
+
+    if action == "associationChange":
+        # a time entry's company is a column, so either end being one of our
+        # objects means that object must be re-read
+        out = []
+        for side in ("from", "to"):
+            obj_type = OBJECT_TYPE_IDS.get(str(event.get(f"{side}ObjectTypeId")))
+            obj_id = event.get(f"{side}ObjectId")
+            if obj_type and obj_id is not None:
+                out.append((obj_type, str(obj_id), "changed"))
+        return out
+
+    obj_type = OBJECT_TYPE_IDS.get(str(event.get("objectTypeId"))) \
+        or SUBSCRIPTION_PREFIXES.get(prefix)
+    if not obj_type:
+        return []
+    if action == "merge":
+        out = [(obj_type, str(event["primaryObjectId"]), "changed")] \
+            if event.get("primaryObjectId") else []
+        return out + [(obj_type, str(x), "deleted")
+                      for x in event.get("mergedObjectIds", [])]
+    if event.get("objectId") is None:
+        return []
+    kind = "deleted" if action == "deletion" else "changed"
+    return [(obj_type, str(event["objectId"]), kind)]
+
+
+class WebhookBatcher:
+    def __init__(self, flush_after: float = HUBSPOT_WEBHOOK_FLUSH_SECONDS):
+        self.flush_after = flush_after
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._changed: Dict[str, Set[str]] = {}
+        self._deleted: Dict[str, Set[str]] = {}
+        self._timer: Optional[threading.Timer] = None
+        self.stats = {"events": 0, "ignored": 0, "flushes": 0, "errors": 0}
+
+    def add(self, events: List[Dict]) -> int:
+        """Queue a delivery; returns how many events were relevant."""
+        accepted = 0
+        full_batch = False
+        with self._lock:
+            for event in sorted(events, key=lambda e: e.get("occurredAt", 0)):
+                changes = _event_changes(event)
+                if not changes:
+                    self.stats["ignored"] += 1
+                    continue
+                accepted += 1
+                for obj_type, obj_id, kind in changes:
+                    changed = self._changed.setdefault(obj_type, set())
+                    deleted = self._deleted.setdefault(obj_type, set())
+                    # the latest event for an id wins
+                    if kind == "deleted":
+                        changed.discard(obj_id)
+                        deleted.add(obj_id)
+                    else:
+                        deleted.discard(obj_id)
+                        changed.add(obj_id)
+                    full_batch = full_batch or len(changed) >= MAX_BATCH
+            self.stats["events"] += accepted
+            if accepted and not full_batch:
+                self._schedule()
+        if full_batch:
+            threading.Thread(target=self.flush, daemon=True).start()
+        return accepted
+
+    def _schedule(self) -> None:
+        # caller holds self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_after, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> Dict[str, Dict[str, int]]:
+        """Apply everything queued so far."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            changed, self._changed = self._changed, {}
+            deleted, self._deleted = self._deleted, {}
+
+        results: Dict[str, Dict[str, int]] = {}
+        with self._flush_lock:  # keep flushes ordered
+            for obj_type in set(changed) | set(deleted):
+                ids = sorted(changed.get(obj_type, ()))
+                gone = sorted(deleted.get(obj_type, ()))
+                if not ids and not gone:
+                    continue
+                try:
+                    results[obj_type] = hubspot.apply_object_changes(
+                        obj_type, ids, gone)
+                except Exception as e:
+                    print(
+                        f"[WebhookBatcher] ❌ Failed to apply {obj_type} changes: {e}")
+                    # re-queue so the next delivery (or flush) retries them
+                    with self._lock:
+                        self.stats["errors"] += 1
+                        self._changed.setdefault(obj_type, set()).update(
+                            i for i in ids if i not in self._deleted.get(obj_type, ()))
+                        self._deleted.setdefault(obj_type, set()).update(
+                            i for i in gone if i not in self._changed.get(obj_type, ()))
+                        self._schedule()
+            with self._lock:
+                self.stats["flushes"] += 1
+        return results
+
+    def pending(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                obj_type: {"changed": len(self._changed.get(obj_type, ())),
+                           "deleted": len(self._deleted.get(obj_type, ()))}
+                for obj_type in set(self._changed) | set(self._deleted)
+            }
+
+
+webhook_batcher = WebhookBatcher()
@@ -0,0 +1,221 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from httpx import RemoteProtocolError
+from postgrest.exceptions import APIError
+
+# Keyset ("seek") pagination over Supabase/PostgREST queries.
+#
+# Each page asks for `key > last key seen` ordered by `key`, so Postgres walks
+# the index from where the previous page stopped instead of skipping `offset`
+# rows; a full scan costs O(rows) rather than O(rows²).
+#
+# PostgREST query builders mutate in place (every .gt()/.order()/.limit()
+# appends to the same request), so callers pass a factory that builds a fresh
+# filtered query for each page.
+#
+# Long date ranges can additionally be split into shards on a timestamp column
+# (typically one per 26th→25th window) that are paged concurrently.
+#
+# The iter_* variants yield pages as they arrive so callers can aggregate and
+# discard them; with shards, fetching continues in the background (bounded by
+# max_pending pages) while the caller works on the current page.
+
+REPORT_FETCH_WORKERS = int(os.getenv("REPORT_FETCH_WORKERS", "4"))
+
+# (lower bound inclusive, upper bound, upper bound inclusive?)
+Shard = Tuple[str, str, bool]
+
+
+def _is_statement_timeout(e: APIError) -> bool:
+    payload = e.args[0] if e.args else {}
+    code = payload.get("code") if isinstance(payload, dict) else None
+    return (code or getattr(e, "code", None)) == "57014"
+
+
+def iter_keyset_pages(
+    make_query: Callable[[], object],
+    key: str = "id",
+    page_size: int = 1000,
+    min_page_size: int = 50,
+    max_retries: int = 3,
+    log_prefix: str = "[fetch_all_keyset]",
+) -> Iterator[List[Dict]]:
+    """
+    Yield every row of `make_query()` in pages ordered by `key` (which must be
+    unique and selected).  Network errors and statement timeouts (57014) are
+    retried with a smaller page and a short backoff.
+    """
+    last: Optional[object] = None
+    page_idx = 0
+    total = 0
+
+    while True:
+        attempt = 0
+        while True:
+            q = make_query()
+            if last is not None:
+                q = q.gt(key, last)
+            q = q.order(key, desc=False).limit(page_size)
+            try:
+                batch = q.execute().data or []
+                print(
+                    f"{log_prefix} page={page_idx} after={last} size={page_size} rows={len(batch)}")
+                break
+            except (RemoteProtocolError, APIError) as e:
+                if isinstance(e, APIError) and not _is_statement_timeout(e):
+                    raise  # other API errors -> surface
+                attempt += 1
+                page_size = max(min_page_size, page_size // 2)
+                backoff = min(0.25 * (2 ** (attempt - 1)), 2.0)
+                print(
+                    f"{log_prefix} {type(e).__name__}: retry {attempt}/{max_retries}, sleep={backoff:.2f}s, new_page_size={page_size}")
+                if attempt >= max_retries:
+                    raise
+                time.sleep(backoff)
+
+        # no short-page shortcut: PostgREST's max-rows may cap pages below
+        # page_size, so only an empty page means we're done
+        if not batch:
+            break
+        page_idx += 1
+        total += len(batch)
+        last = batch[-1][key]
+        yield batch
+
+    print(f"{log_prefix} total_rows={total} pages={page_idx}")
+
+
+def fetch_all_keyset(make_query: Callable[[], object], key: str = "id", **kwargs) -> List[Dict]:
+    return [row for page in iter_keyset_pages(make_query, key=key, **kwargs) for row in page]
+
+
+def window_shards(windows: Sequence[Tuple[str, str]]) -> List[Shard]:
+    """
+    Turn inclusive (start_iso, end_iso) windows into contiguous shards:
+    [start_i, start_i+1) for all but the newest, which keeps its inclusive
+    end.  Nothing between one window's 23:59:59 and the next 00:00 is lost.
+    """
+    ordered = sorted(windows)
+    shards: List[Shard] = [
+        (ordered[i][0], ordered[i + 1][0], False) for i in range(len(ordered) - 1)]
+    shards.append((ordered[-1][0], ordered[-1][1], True))
+    return shards
+
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _iter_shard_pages(
+    make_query: Callable[[], object],
+    shards: Sequence[Shard],
+    column: str,
+    key: str,
+    workers: int,
+    max_retries: int,
+    log_prefix: str,
+    max_pending: int,
+) -> Iterator[Tuple[int, List[Dict]]]:
+    """Yield (shard index, page) in arrival order; shards run concurrently."""
+    def shard_query(lo: str, hi: str, inclusive: bool) -> Callable[[], object]:
+        def make():
+            q = make_query().gte(column, lo)
+            return q.lte(column, hi) if inclusive else q.lt(column, hi)
+        return make
+
+    def pages_of(i: int):
+        return iter_keyset_pages(shard_query(*shards[i]), key=key, max_retries=max_retries,
+                                 log_prefix=f"{log_prefix}[{i}]")
+
+    if len(shards) <= 1 or workers <= 1:
+        for i in range(len(shards)):
+            for page in pages_of(i):
+                yield i, page
+        return
+
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(i: int) -> None:
+        try:
+            for page in pages_of(i):
+                if not put((i, page)):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(shards)),
+                              thread_name_prefix="report-fetch")
+    try:
+        for i in range(len(shards)):
+            pool.submit(run, i)
+        remaining = len(shards)
+        while remaining:
+            item = q.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _Failure):
+                raise item.error
+            else:
+                yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_sharded_pages(
+    make_query: Callable[[], object],
+    shards: Sequence[Shard],
+    column: str = "start_time",
+    key: str = "id",
+    workers: int = REPORT_FETCH_WORKERS,
+    max_retries: int = 3,
+    log_prefix: str = "[fetch_all_sharded]",
+    max_pending: int = 8,
+) -> Iterator[List[Dict]]:
+    """
+    Pages of every `column` shard, fetched `workers` shards at a time, in
+    arrival order.  Pages of one shard still arrive in `key` order.
+    """
+    for _, page in _iter_shard_pages(make_query, shards, column, key, workers,
+                                     max_retries, log_prefix, max_pending):
+        yield page
+
+
+def fetch_all_sharded(
+    make_query: Callable[[], object],
+    shards: Sequence[Shard],
+    column: str = "start_time",
+    key: str = "id",
+    workers: int = REPORT_FETCH_WORKERS,
+    max_retries: int = 3,
+    log_prefix: str = "[fetch_all_sharded]",
+) -> List[Dict]:
+    """
+    Materialised iter_sharded_pages: rows grouped by shard (in shard order),
+    then by `key`.
+    """
+    parts: List[List[Dict]] = [[] for _ in shards]
+    for i, page in _iter_shard_pages(make_query, shards, column, key, workers,
+                                     max_retries, log_prefix, max_pending=len(shards) * 4):
+        parts[i].extend(page)
+    return [row for part in parts for row in part]
@@ -1,4 +1,5 @@
 from app.supabase.client import supabase
+from app.services.pagination import iter_keyset_pages, iter_sharded_pages
 from collections import defaultdict
 from dateutil.relativedelta import relativedelta
 import matplotlib.dates as mdates
@@ -66,34 +67,40 @@ class ReportsService:
         next_day_ts = dt_module.datetime.combine(
             newest_date + timedelta(days=1), time(0, 0), tzinfo=timezone.utc).isoformat()
 
-        base_q = supabase.table("time_entries") \
-            .select("id, hours, minutes, start_time, end_time, tag, description") \
-            .eq("company_hubspot_id", company_id) \
-            .gte("start_time", oldest_ts) \
-            .lt("start_time", next_day_ts)
-        if exclude_tag:
-            base_q = base_q.neq("tag", exclude_tag)
-        if entry_type:
-            base_q = base_q.eq("entry_type", entry_type)
-
-        entries = ReportsService._fetch_all_entries(base_q)
-
-        # 4) Bucket daily totals
+        def entries_query():
+            q = supabase.table("time_entries") \
+                .select("id, hours, minutes, start_time, end_time, tag, description") \
+                .eq("company_hubspot_id", company_id)
+            if exclude_tag:
+                q = q.neq("tag", exclude_tag)
+            if entry_type:
+                q = q.eq("entry_type", entry_type)
+            return q
+
+        # one shard per window: [window start, next window start), the last
+        # one ending at next_day_ts
+        edges = [dt_module.datetime.combine(
+            dt_module.date.fromisoformat(start_iso), time(0, 0), tzinfo=timezone.utc).isoformat()
+            for start_iso, _ in windows] + [next_day_ts]
+        edges[0] = oldest_ts
+        shards = [(edges[i], edges[i + 1], False) for i in range(len(windows))]
+        # 4) Bucket daily totals as pages arrive
         daily_totals = defaultdict(float)
         entry_rows = []
-        for e in entries:
-            entry_date = isoparse(e["start_time"]).astimezone(
-                timezone.utc).date().isoformat()
-            hrs = float(e.get("hours") or 0)
-            entry_rows.append({
-                "id": e["id"],
-                "start_time": e["start_time"],
-                "end_time": e["end_time"],
-                "hours": hrs,
-                "tag": e.get("tag", ""),
-                "description": e.get("description", "")
-            })
-            daily_totals[entry_date] += hrs
+        for page in ReportsService._iter_entry_pages(entries_query, shards):
+            for e in page:
+                entry_date = isoparse(e["start_time"]).astimezone(
+                    timezone.utc).date().isoformat()
+                hrs = float(e.get("hours") or 0)
+                entry_rows.append({
+                    "id": e["id"],
+                    "start_time": e["start_time"],
+                    "end_time": e["end_time"],
+                    "hours": hrs,
+                    "tag": e.get("tag", ""),
+                    "description": e.get("description", "")
+                })
+                daily_totals[entry_date] += hrs
 
         total_time = sum(daily_totals.values())
         entry_rows.sort(key=lambda r: r["start_time"])
@@ -228,19 +235,14 @@ class ReportsService:
         return base64.b64encode(buf.read()).decode()
 
     @staticmethod
-    def _fetch_all_entries(query):
-        all_rows = []
-        page = 0
-        page_size = 1000
-        while True:
-            start = page * page_size
-            end = start + page_size - 1
-            batch = query.range(start, end).execute().data or []
-            if not batch:
-                break
-            all_rows.extend(batch)
-            page += 1
-        return all_rows
+    def _iter_entry_pages(make_query, shards=None):
+        # keyset pages on id (per start_time shard, concurrently, if given);
+        # make_query() must build a fresh query each call
+        if shards:
+            return iter_sharded_pages(make_query, shards, column="start_time", key="id",
+                                      log_prefix="[ReportsService._iter_entry_pages]")
+        return iter_keyset_pages(make_query, key="id",
+                                 log_prefix="[ReportsService._iter_entry_pages]")
 
     @staticmethod
     def get_period_range(month_year: str, offset: int = 0):
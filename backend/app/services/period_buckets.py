@@ -0,0 +1,210 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from app.services.entry_columns import (
+    EntryColumns, NAT, NO_ID, BAD_ID, group_sum, to_epoch_us)
+
+# Vectorised (company, period) bucketing shared by the usage reports.
+#
+# Window bounds are parsed once into sorted int64 microsecond arrays; each page
+# of entries (as EntryColumns) is assigned to its windows with one
+# searchsorted call, then summed per (company, window) with bincount.  Totals,
+# rolling sums and raw per-company totals all come out of the same pass.
+
+
+class PeriodBuckets:
+    """
+    Accumulates hours per (company, window) from pages of entries.
+
+    windows        inclusive (start_iso, end_iso) pairs, in output order
+    companies      only these company ids are bucketed (None = any id)
+    rolling        {name: cutoff_iso}: per-company sums of entries at/after
+                   the cutoff, whether or not they fall in a window
+    ids_for_window keep entry ids of this window index (for "logs")
+    by_company     False groups every entry under company 0
+    """
+
+    def __init__(
+        self,
+        windows: Sequence[Tuple[str, str]],
+        companies: Optional[Iterable[int]] = None,
+        rolling: Optional[Dict[str, str]] = None,
+        ids_for_window: Optional[int] = None,
+        by_company: bool = True,
+    ):
+        self.n_windows = len(windows)
+        starts = to_epoch_us([s for s, _ in windows])
+        ends = to_epoch_us([e for _, e in windows])
+        self._order = np.argsort(starts, kind="stable")
+        self._starts = starts[self._order]
+        self._ends = ends[self._order]
+
+        self._allowed = None if companies is None else np.array(
+            sorted({int(c) for c in companies}), dtype=np.int64)
+        self.rolling_names = list(rolling or {})
+        self._rolling_cutoffs = to_epoch_us([rolling[n] for n in self.rolling_names])
+        self.ids_for_window = ids_for_window
+        self.by_company = by_company
+
+        self._index: Dict[int, int] = {}         # company id → row
+        self._companies: List[int] = []
+        self._totals = np.zeros((0, self.n_windows))
+        self._rolling = np.zeros((0, len(self.rolling_names)))
+        self._bucketed = np.zeros(0, dtype=bool)   # has ≥1 entry in a window
+        self._bucketed_order: List[int] = []       # rows, first-bucketed order
+
+        self.raw_totals: Dict[Optional[int], float] = {}
+        self._window_ids: Dict[int, List] = {}
+        self.entries = 0
+        self.missing_company = 0   # entries for companies outside `companies`
+        self.not_bucketed = 0      # entries outside every window
+        self.min_time: Optional[int] = None
+        self.max_time: Optional[int] = None
+
+    # ── accumulation ────────────────────────────────────────────────────────
+
+    def _rows_for(self, cids: np.ndarray) -> np.ndarray:
+        uniq, first, inverse = np.unique(
+            cids, return_index=True, return_inverse=True)
+        new = [int(c) for c in uniq[np.argsort(first)] if int(c) not in self._index]
+        if new:
+            for c in new:
+                self._index[c] = len(self._companies)
+                self._companies.append(c)
+            grow = len(new)
+            self._totals = np.vstack(
+                [self._totals, np.zeros((grow, self.n_windows))])
+            self._rolling = np.vstack(
+                [self._rolling, np.zeros((grow, len(self.rolling_names)))])
+            self._bucketed = np.concatenate(
+                [self._bucketed, np.zeros(grow, dtype=bool)])
+        lookup = np.array([self._index[int(c)] for c in uniq], dtype=np.int64)
+        return lookup[inverse.reshape(-1)]
+
+    def add(self, page: Union[EntryColumns, List[Dict]]) -> None:
+        cols = page if isinstance(page, EntryColumns) else EntryColumns.from_rows(page)
+        n = len(cols)
+        if not n:
+            return
+        self.entries += n
+        company = cols.company if self.by_company else np.zeros(n, dtype=np.int64)
+
+        # raw per-company totals (missing company under None; junk ids skipped)
+        valid = company != BAD_ID
+        for cid, hrs, _ in zip(*group_sum(company[valid], cols.hours[valid])):
+            key = None if cid == NO_ID else cid
+            self.raw_totals[key] = self.raw_totals.get(key, 0.0) + hrs
+
+        keep = valid & (company != NO_ID)
+        if self._allowed is not None:
+            keep &= np.isin(company, self._allowed)
+        self.missing_company += int(np.count_nonzero(valid) - np.count_nonzero(keep))
+
+        keep &= cols.start != NAT
+        if not keep.any():
+            return
+
+        sel = np.flatnonzero(keep)
+        t = cols.start[sel]
+        h = cols.hours[sel]
+        company_rows = self._rows_for(company[sel])
+
+        lo, hi = int(t.min()), int(t.max())
+        self.min_time = lo if self.min_time is None else min(self.min_time, lo)
+        self.max_time = hi if self.max_time is None else max(self.max_time, hi)
+
+        # window assignment: last window starting at/before t, if t ≤ its end
+        pos = np.searchsorted(self._starts, t, side="right") - 1
+        placed = pos >= 0
+        placed[placed] = t[placed] <= self._ends[pos[placed]]
+        self.not_bucketed += int(np.count_nonzero(~placed))
+
+        if placed.any():
+            win = self._order[pos[placed]]
+            rows_p = company_rows[placed]
+            flat = rows_p * self.n_windows + win
+            self._totals += np.bincount(
+                flat, weights=h[placed], minlength=self._totals.size
+            ).reshape(self._totals.shape)
+            for r in rows_p[np.sort(np.unique(rows_p, return_index=True)[1])]:
+                if not self._bucketed[r]:
+                    self._bucketed[r] = True
+                    self._bucketed_order.append(int(r))
+            if self.ids_for_window is not None:
+                in_window = win == self.ids_for_window
+                for entry_id, r in zip(cols.ids[sel[placed][in_window]].tolist(),
+                                       rows_p[in_window].tolist()):
+                    self._window_ids.setdefault(self._companies[r], []).append(entry_id)
+
+        for k, cutoff in enumerate(self._rolling_cutoffs):
+            after = t >= cutoff
+            if after.any():
+                self._rolling[:, k] += np.bincount(
+                    company_rows[after], weights=h[after], minlength=len(self._companies))
+
+    def add_aggregates(self, data: Dict) -> None:
+        """
+        Merge sums computed elsewhere — the jsonb document returned by the
+        report_period_usage SQL function (sql/report_aggregates.sql) — so the
+        result reads exactly as if the entries had been add()ed.
+        """
+        def company_of(cid) -> int:
+            return int(cid) if self.by_company else 0
+
+        def allowed(cid: int) -> bool:
+            return self._allowed is None or not self.by_company or cid in self._allowed
+
+        self.entries += int(data.get("entries") or 0)
+        self.not_bucketed += int(data.get("not_bucketed") or 0)
+        for key, pick in (("min_start", min), ("max_start", max)):
+            if data.get(key):
+                t = int(to_epoch_us([data[key]])[0])
+                attr = "min_time" if key == "min_start" else "max_time"
+                current = getattr(self, attr)
+                setattr(self, attr, t if current is None else pick(current, t))
+
+        for cid, hrs in data.get("raw") or []:
+            key = None if cid is None else company_of(cid)
+            self.raw_totals[key] = self.raw_totals.get(key, 0.0) + float(hrs or 0)
+
+        windows = [w for w in data.get("windows") or [] if allowed(int(w[1]))]
+        if windows:
+            win = np.array([int(w[0]) for w in windows], dtype=np.int64)
+            rows = self._rows_for(np.array([company_of(w[1]) for w in windows], dtype=np.int64))
+            np.add.at(self._totals, (rows, win), [float(w[2] or 0) for w in windows])
+            for r in rows[np.sort(np.unique(rows, return_index=True)[1])]:
+                if not self._bucketed[r]:
+                    self._bucketed[r] = True
+                    self._bucketed_order.append(int(r))
+
+        rolling = [r for r in data.get("rolling") or [] if allowed(int(r[1]))]
+        if rolling:
+            rows = self._rows_for(np.array([company_of(r[1]) for r in rolling], dtype=np.int64))
+            np.add.at(self._rolling, (rows, [int(r[0]) for r in rolling]),
+                      [float(r[2] or 0) for r in rolling])
+
+        if self.ids_for_window is not None:
+            for cid, ids in data.get("ids") or []:
+                if allowed(int(cid)):
+                    self._window_ids.setdefault(company_of(cid), []).extend(ids or [])
+
+    # ── results ─────────────────────────────────────────────────────────────
+
+    def companies(self) -> List[int]:
+        """Companies with at least one entry in a window, first-seen order."""
+        return [self._companies[r] for r in self._bucketed_order]
+
+    def totals(self, company_id: int = 0) -> List[float]:
+        row = self._index.get(int(company_id))
+        if row is None:
+            return [0.0] * self.n_windows
+        return self._totals[row].tolist()
+
+    def window_ids(self, company_id: int = 0) -> List:
+        """Entry ids in window `ids_for_window`, in arrival order."""
+        return self._window_ids.get(int(company_id), [])
+
+    def rolling(self, name: str, company_id: int) -> float:
+        row = self._index.get(int(company_id))
+        if row is None:
+            return 0.0
+        return float(self._rolling[row, self.rolling_names.index(name)])
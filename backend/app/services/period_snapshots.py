@@ -0,0 +1,307 @@
+import os
+import time
+import threading
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from dateutil.parser import isoparse
+from dateutil.relativedelta import relativedelta
+from app.supabase.client import supabase
+from app.services.daily_rollup import ANY_TAG, daily_rollup
+from app.services.entry_columns import (
+    NAT, EntryColumns, iter_entry_columns, to_epoch_us)
+from app.services.pagination import iter_sharded_pages
+
+# Frozen aggregates for closed 26th→25th periods.
+#
+# A snapshot holds hours per (company, UTC day) for one closed window and one
+# set of entry filters (entry_type, tag), all companies included, so any report
+# can bucket it like rollup rows (day-level rows keep rolling cutoffs exact).
+# It is built once — from the daily rollup when installed, otherwise from one
+# scan of that window's time_entries — kept in memory and persisted to the
+# `report_snapshots` table (sql/report_snapshots.sql) so restarts reuse it.
+#
+# A snapshot is dropped when a late edit lands inside its window:
+#  - syncs and webhook changes call invalidate_days() with the days of every
+#    entry they wrote or deleted (old and new start_time);
+#  - snapshots built from the rollup also record the rollup watermark they
+#    saw, and are rebuilt if any rollup row of their window has a newer
+#    updated_at (which also catches writes made by other processes).
+#  - snapshots built from time entries can't be checked against the rollup,
+#    so each process re-reads the persisted row's created_at at most every
+#    SNAPSHOT_RECHECK_SECONDS: if another process invalidated the window (row
+#    deleted) or rebuilt it (newer created_at) the local copy is rebuilt too, and
+#    straight away after mark_stale() (report_cache calls it when the data
+#    version moves).  When the table isn't available they simply expire after
+#    SNAPSHOT_TTL_SECONDS.
+# A build that overlaps an invalidation of its window is not stored.
+# Only windows whose end is in the past are ever snapshotted.
+
+SNAPSHOT_TABLE = "report_snapshots"
+SNAPSHOT_RECHECK_SECONDS = float(os.getenv("REPORT_SNAPSHOT_RECHECK_SECONDS", "30"))
+SNAPSHOT_TTL_SECONDS = float(os.getenv("REPORT_SNAPSHOT_TTL_SECONDS", "3600"))
+_US_PER_DAY = 86_400_000_000
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def is_closed(window: Tuple[str, str]) -> bool:
+    return date.fromisoformat(window[1][:10]) < _today()
+
+
+def window_start_for(day: date) -> date:
+    """Start (the 26th) of the 26th→25th window containing `day`."""
+    if day.day >= 26:
+        return day.replace(day=26)
+    return (day - relativedelta(months=1)).replace(day=26)
+
+
+def days_of(values: Iterable[Optional[str]]) -> Set[date]:
+    """UTC days of ISO timestamps (None/'' ignored)."""
+    us = to_epoch_us(list(values))
+    return {date.fromordinal(date(1970, 1, 1).toordinal() + int(d))
+            for d in np.unique(us[us != NAT] // _US_PER_DAY)}
+
+
+def filter_key(entry_type: Optional[str], neq_tag) -> str:
+    tag = "*" if neq_tag is ANY_TAG else f"!{neq_tag}"
+    return f"{entry_type or '*'}|{tag}"
+
+
+def _daily_columns(company: np.ndarray, day_us: np.ndarray, hours: np.ndarray) -> EntryColumns:
+    n = len(hours)
+    return EntryColumns(
+        ids=np.full(n, None, dtype=object),
+        start=day_us.astype(np.int64),
+        end=np.full(n, NAT, dtype=np.int64),
+        hours=hours.astype(np.float64),
+        company=company.astype(np.int64),
+        owner=np.full(n, -1, dtype=np.int64),
+        tag=np.full(n, -1, dtype=np.int32),
+        entry_type=np.full(n, -1, dtype=np.int32),
+    )
+
+
+def _per_company_day(cols: EntryColumns) -> EntryColumns:
+    """Collapse entries (or rollup rows) into one row per (company, day)."""
+    keep = (cols.company >= 0) & (cols.start != NAT)
+    company = cols.company[keep]
+    day_us = cols.start[keep] // _US_PER_DAY * _US_PER_DAY
+    if not len(company):
+        return _daily_columns(company, day_us, cols.hours[keep])
+    keys, inverse = np.unique(np.stack([company, day_us], axis=1), axis=0, return_inverse=True)
+    hours = np.bincount(inverse.reshape(-1), weights=cols.hours[keep], minlength=len(keys))
+    return _daily_columns(keys[:, 0], keys[:, 1], hours)
+
+
+class Snapshot:
+    def __init__(self, window: Tuple[str, str], key: str, columns: EntryColumns,
+                 source: str, as_of: Optional[datetime]):
+        self.window = window
+        self.key = key
+        self.columns = columns
+        self.source = source      # "rollup" or "entries"
+        self.as_of = as_of        # rollup watermark it was built from
+        # build time, written as created_at so each rebuild is told apart
+        self.built_at = datetime.now(timezone.utc)
+        self.stored_at: Optional[datetime] = None   # created_at of its persisted row
+        self.checked = time.monotonic()        # last time that row was seen
+
+    def select(self, companies: Optional[Iterable[int]] = None) -> EntryColumns:
+        cols = self.columns
+        if companies is None:
+            return cols
+        sel = np.flatnonzero(np.isin(
+            cols.company, np.array([int(c) for c in companies], dtype=np.int64)))
+        return EntryColumns(*(getattr(cols, f)[sel] for f in EntryColumns.__slots__))
+
+    def to_row(self) -> Dict:
+        cols = self.columns
+        return {
+            "key": self.key,
+            "period_start": self.window[0][:10],
+            "period_end": self.window[1][:10],
+            "source": self.source,
+            "as_of": self.as_of.isoformat() if self.as_of else None,
+            "created_at": self.built_at.isoformat(),
+            "data": {"company": cols.company.tolist(), "day_us": cols.start.tolist(),
+                     "hours": cols.hours.tolist()},
+        }
+
+    @classmethod
+    def from_row(cls, window: Tuple[str, str], row: Dict) -> "Snapshot":
+        data = row.get("data") or {}
+        cols = _daily_columns(np.array(data.get("company", []), dtype=np.int64),
+                              np.array(data.get("day_us", []), dtype=np.int64),
+                              np.array(data.get("hours", []), dtype=np.float64))
+        as_of = isoparse(row["as_of"]) if row.get("as_of") else None
+        snap = cls(window, row["key"], cols, row.get("source") or "entries", as_of)
+        if row.get("created_at"):
+            snap.built_at = snap.stored_at = isoparse(row["created_at"])
+        return snap
+
+
+class PeriodSnapshots:
+    def __init__(self, table: str = SNAPSHOT_TABLE):
+        self.table = table
+        self._mem: Dict[str, Snapshot] = {}
+        self._lock = threading.Lock()
+        self._persist = True
+        self._generations: Dict[str, int] = {}   # window start → invalidations
+        self._moved = 0.0   # last mark_stale(); rows checked before it are re-read
+        self.stats = {"hits": 0, "builds": 0, "invalidated": 0, "discarded": 0}
+
+    # ── storage ─────────────────────────────────────────────────────────────
+
+    def _load(self, window: Tuple[str, str], key: str) -> Optional[Snapshot]:
+        if not self._persist:
+            return None
+        try:
+            rows = supabase.table(self.table).select("*").eq("key", key).limit(1).execute().data or []
+        except Exception as e:
+            print(f"[PeriodSnapshots] ⚠️ {self.table} unavailable, keeping snapshots in memory: {e}")
+            self._persist = False
+            return None
+        return Snapshot.from_row(window, rows[0]) if rows else None
+
+    def _save(self, snap: Snapshot) -> None:
+        if not self._persist:
+            return
+        try:
+            supabase.table(self.table).upsert(snap.to_row(), on_conflict="key").execute()
+        except Exception as e:
+            print(f"[PeriodSnapshots] ⚠️ Could not persist {snap.key}: {e}")
+            return
+        snap.stored_at = snap.built_at
+
+    # ── build / read ────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _build(window: Tuple[str, str], key: str, entry_type: Optional[str], neq_tag) -> Snapshot:
+        daily = daily_rollup.select(window[0], window[1], entry_type=entry_type, neq_tag=neq_tag)
+        if daily is not None:
+            # an empty rollup has no watermark yet: any row that appears is newer
+            as_of = daily_rollup.watermark or datetime.min.replace(tzinfo=timezone.utc)
+            return Snapshot(window, key, _per_company_day(daily), "rollup", as_of)
+
+        def make_query():
+            q = supabase.table("time_entries").select("id, company_hubspot_id, hours, start_time")
+            if neq_tag is not ANY_TAG:
+                q = q.neq("tag", neq_tag)
+            if entry_type:
+                q = q.eq("entry_type", entry_type)
+            return q
+
+        parts: List[EntryColumns] = []
+        for cols in iter_entry_columns(iter_sharded_pages(
+                make_query, [(window[0], window[1], True)],
+                log_prefix=f"[PeriodSnapshots {window[0][:10]}]")):
+            parts.append(_per_company_day(cols))
+        return Snapshot(window, key, _per_company_day(EntryColumns.concat(parts)), "entries", None)
+
+    def _still_persisted(self, snap: Snapshot) -> bool:
+        """Whether an entries-built snapshot is still the one other processes see."""
+        if not self._persist or snap.stored_at is None:
+            return time.monotonic() - snap.checked < SNAPSHOT_TTL_SECONDS
+        if snap.checked > self._moved and time.monotonic() - snap.checked < SNAPSHOT_RECHECK_SECONDS:
+            return True
+        try:
+            rows = (supabase.table(self.table).select("created_at")
+                    .eq("key", snap.key).limit(1).execute()).data or []
+        except Exception as e:
+            print(f"[PeriodSnapshots] ⚠️ Could not re-check {snap.key}: {e}")
+            return False
+        if not rows or not rows[0].get("created_at") or isoparse(rows[0]["created_at"]) != snap.stored_at:
+            return False  # invalidated or rebuilt elsewhere
+        snap.checked = time.monotonic()
+        return True
+
+    def mark_stale(self) -> None:
+        """Re-check every entries-built snapshot's persisted row on next use."""
+        self._moved = time.monotonic()
+
+    def _valid(self, snap: Snapshot) -> bool:
+        if snap.source != "rollup":
+            return self._still_persisted(snap)
+        if not daily_rollup.refresh():
+            return False  # built from a rollup we can no longer check
+        return snap.as_of is not None and not daily_rollup.changed_since(
+            snap.window[0], snap.window[1], snap.as_of)
+
+    def get(self, window: Tuple[str, str], entry_type: Optional[str] = None,
+            neq_tag=ANY_TAG) -> Optional[Snapshot]:
+        """Snapshot of a closed window (built on first use); None if still open."""
+        if not is_closed(window):
+            return None
+        key = f"{window[0][:10]}|{window[1][:10]}|{filter_key(entry_type, neq_tag)}"
+        start = window[0][:10]
+        with self._lock:
+            snap = self._mem.get(key)
+            generation = self._generations.get(start, 0)
+        if snap is None:
+            snap = self._load(window, key)
+        if snap is not None and self._valid(snap):
+            with self._lock:
+                if self._generations.get(start, 0) == generation:
+                    self._mem[key] = snap
+                    self.stats["hits"] += 1
+                    return snap
+            snap = None  # invalidated while it was being checked
+
+        snap = self._build(window, key, entry_type, neq_tag)
+        self.stats["builds"] += 1
+        print(f"[PeriodSnapshots] built {key} from {snap.source}: {len(snap.columns)} rows")
+        with self._lock:
+            current = self._generations.get(start, 0) == generation
+            if current:
+                self._mem[key] = snap
+        if not current:
+            # a write landed in this window mid-build: serve it once, don't keep it
+            self.stats["discarded"] += 1
+            print(f"[PeriodSnapshots] {key} invalidated during build; not stored")
+            return snap
+        self._save(snap)
+        with self._lock:
+            current = self._generations.get(start, 0) == generation
+        if not current:
+            self._drop_persisted(key)  # invalidated while it was being saved
+        return snap
+
+    def _drop_persisted(self, key: str) -> None:
+        if not self._persist:
+            return
+        try:
+            supabase.table(self.table).delete().eq("key", key).execute()
+        except Exception as e:
+            print(f"[PeriodSnapshots] ⚠️ Could not drop {key}: {e}")
+
+    # ── invalidation ────────────────────────────────────────────────────────
+
+    def invalidate_days(self, days: Iterable[date]) -> int:
+        """Drop snapshots of every closed window containing one of `days`."""
+        starts = {window_start_for(d).isoformat() for d in days}
+        if not starts:
+            return 0
+        with self._lock:
+            for start in starts:
+                self._generations[start] = self._generations.get(start, 0) + 1
+            stale = [k for k in self._mem if k.split("|", 1)[0] in starts]
+            for k in stale:
+                del self._mem[k]
+        if self._persist:
+            try:
+                supabase.table(self.table).delete().in_("period_start", sorted(starts)).execute()
+            except Exception as e:
+                print(f"[PeriodSnapshots] ⚠️ Could not drop persisted snapshots: {e}")
+        self.stats["invalidated"] += len(stale)
+        if stale:
+            print(f"[PeriodSnapshots] invalidated {len(stale)} snapshots for periods {sorted(starts)}")
+        return len(stale)
+
+    def status(self) -> Dict:
+        return {"snapshots": len(self._mem), "persisted": self._persist, **self.stats}
+
+
+period_snapshots = PeriodSnapshots()
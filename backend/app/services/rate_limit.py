@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+import contextlib
+import contextvars
+from typing import Mapping, Optional
+import requests
+
+# Process-wide pacing for HubSpot API calls.
+#
+# Every caller (sync jobs, the async shard fetchers, owner and schema lookups
+# made by report endpoints) takes a token from one shared bucket before each
+# request.  The bucket starts from the configured account limits and is
+# re-tuned from the X-HubSpot-RateLimit-* headers on every response, so we run
+# just under the real limit instead of finding it with 429s.
+#
+# A token is only booked when one is there; otherwise the caller waits and
+# asks again, so nobody runs the bucket into debt ahead of later callers.
+# Background syncs leave INTERACTIVE_RESERVE tokens in the bucket for requests
+# made inside `interactive()`, so a long sync can't starve a report request.
+# Search has its own, much lower, per-second limit and its own bucket.
+
+RATE_LIMIT = int(os.getenv("HUBSPOT_RATE_LIMIT", "100"))              # requests …
+RATE_INTERVAL = float(os.getenv("HUBSPOT_RATE_INTERVAL_SECONDS", "10"))  # … per interval
+SEARCH_RATE_LIMIT = float(os.getenv("HUBSPOT_SEARCH_RATE_LIMIT", "4"))   # requests/second
+SAFETY = 0.9              # fraction of the advertised limit we aim for
+INTERACTIVE_RESERVE = 2   # tokens background callers must leave untouched
+MAX_429_RETRIES = 5
+
+_interactive = contextvars.ContextVar("hubspot_interactive", default=False)
+
+
+@contextlib.contextmanager
+def interactive():
+    """Mark HubSpot calls made in this block as user-facing (may use the reserve)."""
+    token = _interactive.set(True)
+    try:
+        yield
+    finally:
+        _interactive.reset(token)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateGovernor:
+    """
+    Thread-safe token bucket.  reserve() books a token and returns 0, or books
+    nothing and returns how long to wait before asking again, so it works for
+    both threads (acquire()) and coroutines (sleep and retry until it's 0).
+    """
+
+    def __init__(self, name: str, capacity: float, rate: float,
+                 tune_from_headers: bool = True):
+        self.name = name
+        self.tune_from_headers = tune_from_headers
+        self.capacity = capacity
+        self.rate = rate  # tokens per second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens +
+                           (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, interactive: Optional[bool] = None) -> float:
+        if interactive is None:
+            interactive = _interactive.get()
+        floor = 0 if interactive else min(
+            INTERACTIVE_RESERVE, self.capacity - 1)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            deficit = floor + 1 - self._tokens
+            if deficit <= 0:
+                self._tokens -= 1
+                return 0.0
+            delay = deficit / self.rate
+            self.waited += delay
+            return delay
+
+    def acquire(self, interactive: Optional[bool] = None) -> None:
+        while True:
+            delay = self.reserve(interactive)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def observe(self, headers: Mapping[str, str], status: int) -> float:
+        """
+        Re-tune from a response.  Returns the back-off a 429 asks for (0
+        otherwise); the bucket is already drained for that long, so the retry
+        simply goes through acquire() again.
+        """
+        limit = _header_int(headers, "X-HubSpot-RateLimit-Max")
+        interval_ms = _header_int(
+            headers, "X-HubSpot-RateLimit-Interval-Milliseconds")
+        remaining = _header_int(headers, "X-HubSpot-RateLimit-Remaining")
+        secondly = _header_int(headers, "X-HubSpot-RateLimit-Secondly")
+        secondly_left = _header_int(
+            headers, "X-HubSpot-RateLimit-Secondly-Remaining")
+
+        with self._lock:
+            self._refill(time.monotonic())
+            if not self.tune_from_headers:
+                limit = remaining = secondly_left = None
+            if limit and interval_ms:
+                rate = limit / (interval_ms / 1000.0) * SAFETY
+                if secondly:
+                    rate = min(rate, secondly * SAFETY)
+                self.rate = max(0.1, rate)
+                self.capacity = max(1.0, min(limit, secondly or limit) * SAFETY)
+            # Other processes share the account's budget: never believe we
+            # have more tokens than HubSpot says are left.
+            for left in (remaining, secondly_left):
+                if left is not None:
+                    self._tokens = min(self._tokens, left * SAFETY)
+
+            if status != 429:
+                return 0.0
+            self.throttled += 1
+            retry_after = _header_int(headers, "Retry-After")
+            backoff = float(retry_after) if retry_after else max(
+                1.0, 1.0 / self.rate)
+            self._tokens = min(self._tokens, -backoff * self.rate)
+            print(
+                f"[RateGovernor:{self.name}] ⚠️ 429 received, backing off {backoff:.1f}s")
+            return backoff
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate_per_second": round(self.rate, 2),
+                "capacity": self.capacity,
+                "tokens": round(self._tokens, 2),
+                "waited_seconds": round(self.waited, 2),
+                "throttled": self.throttled,
+            }
+
+
+governor = RateGovernor("hubspot", RATE_LIMIT * SAFETY,
+                        RATE_LIMIT / RATE_INTERVAL * SAFETY)
+search_governor = RateGovernor(
+    "hubspot-search", max(1.0, SEARCH_RATE_LIMIT), SEARCH_RATE_LIMIT,
+    tune_from_headers=False)  # the headers describe the account limit
+
+
+def governors_for(url: str):
+    """Search calls count against both the account bucket and the search one."""
+    if url.rstrip("/").endswith("/search"):
+        return (governor, search_governor)
+    return (governor,)
+
+
+class GovernedSession(requests.Session):
+    """requests.Session that paces every call through the shared governors."""
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(MAX_429_RETRIES + 1):
+            for g in governors_for(url):
+                g.acquire()
+            res = super().request(method, url, *args, **kwargs)
+            for g in governors_for(url):
+                g.observe(res.headers, res.status_code)
+            if res.status_code != 429 or attempt == MAX_429_RETRIES:
+                return res
+        return res
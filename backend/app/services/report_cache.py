@@ -0,0 +1,238 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dateutil.parser import isoparse
+from app.supabase.client import supabase
+from app.core.config import (
+    REPORT_CACHE_SIZE, REPORT_CACHE_VERSION_SECONDS, REPORT_CACHE_WARMUP)
+from app.services.daily_rollup import ROLLUP_TABLE, _is_missing_table, daily_rollup
+from app.services.period_snapshots import period_snapshots
+from app.services.sync_jobs import sync_jobs
+
+# In-memory cache of report results.
+#
+# Entries are keyed by endpoint + canonicalised parameters + data version, and
+# the least recently used one is evicted once REPORT_CACHE_SIZE are held.  The
+# data version is the sync watermark `/reports/last_sync` reports (newest
+# time_entries.updated_at) and the same for hubspot_companies, plus two
+# change markers kept in the database: the newest time_entry_daily.updated_at
+# (its triggers bump it on deletes too, which leave no row in time_entries)
+# and the newest sync_state.updated_at (moved by every sync, in any process).
+# It is re-read at most every REPORT_CACHE_VERSION_SECONDS and combined with a
+# local generation that invalidate() bumps, so:
+#  - a finished sync or an applied webhook batch empties the cache at once;
+#  - writes, deletes and syncs by another process show up within
+#    REPORT_CACHE_VERSION_SECONDS.
+# When the version moves, the in-process copies reports are computed from are
+# told before anything is recomputed: the daily rollup is marked stale if the
+# rollup marker is past what it has pulled (otherwise a sync by another
+# process would be answered from a copy up to ROLLUP_REFRESH_SECONDS old and
+# cached under the new version), and period snapshots re-check their
+# persisted rows on next use.
+# After each sync the registered warm-ups (the default dashboard reports) are
+# re-run in the background so the next page load hits the cache.
+#
+# Identical requests that arrive while one is being computed don't start their
+# own scan: they wait for that computation (single flight) and share its
+# result, or its exception.
+
+CacheKey = Tuple[str, str, str]
+# newest updated_at of each of these makes up the data version
+VERSION_TABLES = ("time_entries", "hubspot_companies")
+# ... and of these too, where they are installed (sql/time_entry_daily.sql,
+# sql/sync_state.sql)
+CHANGE_TABLES = (ROLLUP_TABLE, "sync_state")
+
+
+class _Flight:
+    """One in-progress computation that identical requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _canonical(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ReportCache:
+    def __init__(self, max_entries: int = REPORT_CACHE_SIZE,
+                 version_ttl: float = REPORT_CACHE_VERSION_SECONDS):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._inflight: Dict[CacheKey, _Flight] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._watermark: Optional[str] = None
+        self._checked: Optional[float] = None
+        self._warmups: List[Tuple[str, Callable[[], Any]]] = []
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0,
+                      "invalidations": 0, "warmups": 0}
+
+    # ── data version ────────────────────────────────────────────────────────
+
+    def _read_watermark(self) -> Optional[Dict[str, str]]:
+        marks = {}
+        for table in VERSION_TABLES + CHANGE_TABLES:
+            try:
+                rows = (
+                    supabase.table(table)
+                    .select("updated_at")
+                    .order("updated_at", desc=True)
+                    .limit(1)
+                    .execute()
+                ).data or []
+            except Exception as e:
+                if table in CHANGE_TABLES and _is_missing_table(e):
+                    rows = []
+                else:
+                    print(f"[ReportCache] ⚠️ Could not read the {table} watermark: {e}")
+                    return None
+            marks[table] = (rows[0].get("updated_at") or "") if rows else ""
+        return marks
+
+    @staticmethod
+    def _data_moved(marks: Dict[str, str]) -> None:
+        rollup_mark = marks.get(ROLLUP_TABLE)
+        seen = daily_rollup.watermark
+        if rollup_mark and (seen is None or isoparse(rollup_mark) > seen):
+            daily_rollup.mark_stale()
+        period_snapshots.mark_stale()
+
+    def version(self) -> Optional[str]:
+        """Current data version, or None when it can't be determined."""
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._checked is not None and now - self._checked < self.version_ttl
+            generation = self._generation
+        if not fresh:
+            marks = self._read_watermark()
+            if marks is None:
+                return None
+            watermark = "|".join(marks.values())
+            with self._lock:
+                moved = watermark != self._watermark
+            if moved:
+                self._data_moved(marks)
+            with self._lock:
+                if generation == self._generation:
+                    self._watermark, self._checked = watermark, now
+        with self._lock:
+            return f"{self._generation}:{self._watermark}"
+
+    # ── lookups ─────────────────────────────────────────────────────────────
+
+    def get_or_compute(self, endpoint: str, params: Dict[str, Any],
+                       compute: Callable[[], Any], cache: bool = True) -> Any:
+        # without a version (or with caching off) results aren't stored, but
+        # identical concurrent calls still share one computation
+        version = self.version() if cache and self.max_entries > 0 else None
+        store = version is not None
+        key = (endpoint, _canonical(params), version or "")
+        with self._lock:
+            if store and key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if store and flight.error is None:
+                    self._entries[key] = flight.result
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+            flight.done.set()
+        return flight.result
+
+    def cached(self, endpoint: str, skip: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        """
+        Decorator for report functions called with keyword arguments (as
+        FastAPI calls endpoints).  `skip(kwargs)` → True bypasses the cache.
+        """
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(**kwargs):
+                if skip is not None and skip(kwargs):
+                    return fn(**kwargs)
+                return self.get_or_compute(endpoint, kwargs, lambda: fn(**kwargs))
+            return wrapper
+        return decorate
+
+    def single_flight(self, endpoint: str):
+        """Decorator that only coalesces identical concurrent calls."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(**kwargs):
+                return self.get_or_compute(endpoint, kwargs, lambda: fn(**kwargs), cache=False)
+            return wrapper
+        return decorate
+
+    # ── invalidation / warm-up ──────────────────────────────────────────────
+
+    def invalidate(self, reason: str = "") -> None:
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._generation += 1
+            self._checked = None
+            self.stats["invalidations"] += 1
+        print(f"[ReportCache] invalidated ({reason or 'manual'}): dropped {dropped} results")
+
+    def register_warmup(self, name: str, fn: Callable[[], Any]) -> None:
+        self._warmups.append((name, fn))
+
+    def warm(self) -> None:
+        started = time.monotonic()
+        for name, fn in list(self._warmups):
+            try:
+                fn()
+                self.stats["warmups"] += 1
+            except Exception as e:
+                print(f"[ReportCache] ⚠️ Warm-up {name} failed: {e}")
+        print(f"[ReportCache] warmed {len(self._warmups)} reports in {time.monotonic() - started:.1f}s")
+
+    def on_sync_finished(self, job) -> None:
+        self.invalidate(f"{job.kind} sync {job.id} {job.status}")
+        if REPORT_CACHE_WARMUP and self._warmups:
+            threading.Thread(target=self.warm, name="report-cache-warmup", daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": len(self._inflight),
+                "max_entries": self.max_entries,
+                "version": f"{self._generation}:{self._watermark}",
+                **self.stats,
+            }
+
+
+report_cache = ReportCache()
+sync_jobs.on_finished(report_cache.on_sync_finished)
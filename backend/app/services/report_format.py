@@ -0,0 +1,183 @@
+import heapq
+import inspect
+import json
+from functools import wraps
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+from fastapi import HTTPException, Query
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+# Response shaping for the multi-company reports.
+#
+# Their rows each repeat the same `periods` list and the company's whole
+# HubSpot `company_raw` dict.  With ?format=compact the report is sent as
+#   {"format": "compact",
+#    "periods":   [[start, end], ...]            (once)
+#    "columns":   ["company_id", "sla", ...]    (row keys, in order)
+#    "rows":      [[10, 25.0, ...], ...]         (one array per company)
+#    "companies": {"10": {...company_raw...}},   (metadata, once per company)
+#    "total": 120, "next_cursor": "20"}
+# and ?fields=name,domain keeps only those company_raw keys (in either
+# format).  Both formats are encoded with orjson when it is installed; gzip is
+# applied by GZipMiddleware when the client accepts it.
+#
+# Rows can also be filtered (min_/max_percentage, min_total), sorted on one of
+# SORT_KEYS and paged with limit/cursor on the server.  A page is taken with a
+# partial sort (heapq) of the first cursor+limit rows rather than sorting them
+# all; the cursor is the offset of the next page, also sent as X-Next-Cursor
+# (with the filtered row count as X-Total-Count) in the full format.  Rows
+# whose sort value is missing (no SLA → no percentage) always come last.
+
+SHARED_KEYS = ("periods", "company_raw")
+
+
+def json_response(payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS, default=str)
+    else:
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _pick(raw: Optional[Dict], fields: Optional[List[str]]) -> Optional[Dict]:
+    if raw is None or fields is None:
+        return raw
+    return {k: raw[k] for k in fields if k in raw}
+
+
+def to_compact(rows: List[Dict], fields: Optional[List[str]] = None) -> Dict:
+    columns = [k for k in (rows[0] if rows else {}) if k not in SHARED_KEYS]
+    return {
+        "format": "compact",
+        "periods": rows[0].get("periods", []) if rows else [],
+        "columns": columns,
+        "rows": [[row.get(k) for k in columns] for row in rows],
+        "companies": {str(row["company_id"]): _pick(row.get("company_raw"), fields)
+                      for row in rows},
+    }
+
+
+def _first(row: Dict, *keys: str) -> Optional[float]:
+    for k in keys:
+        if row.get(k) is not None:
+            return row[k]
+    return None
+
+
+def _overage(row: Dict) -> Optional[float]:
+    average = _first(row, "average_usage", "average")
+    return None if average is None else average - float(row.get("sla") or 0)
+
+
+# sort key → value of a row (the reports name their totals differently)
+SORT_KEYS: Dict[str, Callable[[Dict], Optional[float]]] = {
+    "percentage_usage": lambda r: r.get("percentage_usage"),
+    "overage": _overage,
+    "total": lambda r: _first(r, "total_usage", "total_time"),
+    "average": lambda r: _first(r, "average_usage", "average"),
+    "sla": lambda r: r.get("sla"),
+    "company_id": lambda r: r.get("company_id"),
+}
+
+
+def _parse_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise HTTPException(400, detail=f"Invalid cursor: {cursor}")
+    return offset
+
+
+def select_rows(rows: List[Dict], sort: Optional[str] = None, descending: bool = True,
+                min_percentage: Optional[float] = None, max_percentage: Optional[float] = None,
+                min_total: Optional[float] = None, limit: Optional[int] = None,
+                cursor: Optional[str] = None) -> Tuple[List[Dict], int, Optional[str]]:
+    """Filter, sort and page report rows → (page, filtered total, next cursor)."""
+    if sort is not None and sort not in SORT_KEYS:
+        raise HTTPException(400, detail=f"Unknown sort key {sort!r}; expected one of {sorted(SORT_KEYS)}")
+    offset = _parse_cursor(cursor)
+
+    pct, total = SORT_KEYS["percentage_usage"], SORT_KEYS["total"]
+    if min_percentage is not None:
+        rows = [r for r in rows if pct(r) is not None and pct(r) >= min_percentage]
+    if max_percentage is not None:
+        rows = [r for r in rows if pct(r) is not None and pct(r) <= max_percentage]
+    if min_total is not None:
+        rows = [r for r in rows if total(r) is not None and total(r) >= min_total]
+    count = len(rows)
+
+    end = None if limit is None else offset + limit
+    if sort is not None:
+        value = SORT_KEYS[sort]
+        if descending:
+            def key(r):
+                v = value(r)
+                return (v is not None, v if v is not None else 0)
+            pick = heapq.nlargest
+        else:
+            def key(r):
+                v = value(r)
+                return (v is None, v if v is not None else 0)
+            pick = heapq.nsmallest
+        rows = pick(end, rows, key=key) if end is not None and end < count else sorted(
+            rows, key=key, reverse=descending)
+    page = rows[offset:end]
+    next_cursor = str(end) if end is not None and end < count else None
+    return page, count, next_cursor
+
+
+def shaped_report(fn):
+    """
+    Add format/fields, filter/sort and limit/cursor query parameters to a
+    report endpoint returning a list of per-company rows.  Anything else it
+    returns (error dicts) is passed through untouched.
+    """
+    extra = {
+        "format": (Literal["full", "compact"], Query("full", description="'compact': periods and company metadata sent once, rows as arrays")),
+        "fields": (Optional[str], Query(None, description="Comma-separated company_raw keys to keep")),
+        "sort": (Optional[str], Query(None, description=f"Sort rows by one of: {', '.join(SORT_KEYS)}")),
+        "descending": (bool, Query(True, description="Sort order (largest first by default)")),
+        "min_percentage": (Optional[float], Query(None, description="Only rows with percentage_usage ≥ this")),
+        "max_percentage": (Optional[float], Query(None, description="Only rows with percentage_usage ≤ this")),
+        "min_total": (Optional[float], Query(None, description="Only rows with total usage ≥ this")),
+        "limit": (Optional[int], Query(None, ge=1, le=1000, description="Page size (top-K when sorted)")),
+        "cursor": (Optional[str], Query(None, description="next_cursor of the previous page")),
+    }
+
+    @wraps(fn)
+    def wrapper(**kwargs):
+        opts = {name: kwargs.pop(name, default.default) for name, (_, default) in extra.items()}
+        result = fn(**kwargs)
+        if not isinstance(result, list):
+            return result
+        fields = opts["fields"]
+        keep = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        page, count, next_cursor = select_rows(
+            result, opts["sort"], opts["descending"], opts["min_percentage"],
+            opts["max_percentage"], opts["min_total"], opts["limit"], opts["cursor"])
+        if opts["format"] == "compact":
+            return json_response({**to_compact(page, keep), "total": count,
+                                  "next_cursor": next_cursor})
+        if keep is not None:
+            page = [{**row, "company_raw": _pick(row.get("company_raw"), keep)}
+                    for row in page]
+        headers = {"X-Total-Count": str(count)}
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = next_cursor
+        return json_response(page, headers)
+
+    sig = inspect.signature(fn)
+    wrapper.__signature__ = sig.replace(parameters=[
+        *sig.parameters.values(),
+        *(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=annotation, default=default)
+          for name, (annotation, default) in extra.items()),
+    ])
+    return wrapper
@@ -0,0 +1,291 @@
+import time
+import uuid
+import threading
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from app.supabase.client import supabase
+from app.services.sync_progress import SyncProgress
+
+# Registry of HubSpot sync runs.
+#
+# Only one sync runs at a time: a request already covered by the running job
+# (a time sync while a full sync runs, or the same kind again) is coalesced
+# onto it; anything else is refused.  Each job tracks its phase, pages, row
+# counts and throughput, and finished runs are appended to the `sync_runs`
+# table (sql/sync_runs.sql) so timings can be compared across deployments.
+
+HISTORY_TABLE = "sync_runs"
+RECENT_JOBS = 50
+
+JOB_KINDS = ("full", "time", "companies", "owners")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class PhaseProgress(SyncProgress):
+    """Progress of one object sync inside a job (phases can overlap)."""
+
+    def __init__(self, job: "SyncJob", name: str, expected: Optional[int]):
+        self.job = job
+        self.name = name
+        self.expected_rows = expected
+        self.rows_fetched = 0
+        self.finished = False
+        self._started = time.monotonic()
+
+    def expect(self, total: Optional[int]) -> None:
+        with self.job._lock:
+            self.expected_rows = total
+
+    def fetched(self, rows: int) -> None:
+        with self.job._lock:
+            self.rows_fetched += rows
+        self.job.fetched(rows)
+
+    def written(self, rows: int) -> None:
+        self.job.written(rows)
+
+    def skipped(self, rows: int) -> None:
+        self.job.skipped(rows)
+
+    def error(self, message: str) -> None:
+        self.job.error(f"{self.name}: {message}")
+
+    def done(self) -> None:
+        with self.job._lock:
+            self.finished = True
+
+    def to_dict(self) -> Dict:
+        elapsed = time.monotonic() - self._started
+        rate = self.rows_fetched / elapsed if elapsed > 0 else 0
+        eta = None
+        if not self.finished and self.expected_rows and rate > 0:
+            eta = max(0.0, (self.expected_rows - self.rows_fetched) / rate)
+        return {
+            "rows_fetched": self.rows_fetched,
+            "expected_rows": self.expected_rows,
+            "rows_per_second": rate,
+            "eta_seconds": eta,
+            "done": self.finished,
+        }
+
+
+class SyncJob(SyncProgress):
+    def __init__(self, kind: str, full: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.full = full
+        self.status = "queued"
+        self.created_at = _now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.pages_fetched = 0
+        self.rows_fetched = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.errors: List[str] = []
+        self.result: Optional[Dict] = None
+        self.phases: Dict[str, PhaseProgress] = {}
+        # result of the last comparable run, used to estimate phase sizes
+        self.previous_result: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    # ── SyncProgress hooks ──────────────────────────────────────────────────
+
+    def phase(self, name: str) -> PhaseProgress:
+        previous = (self.previous_result or {}).get(name) or {}
+        with self._lock:
+            progress = PhaseProgress(self, name, previous.get("fetched"))
+            self.phases[name] = progress
+        return progress
+
+    def fetched(self, rows: int) -> None:
+        with self._lock:
+            self.pages_fetched += 1
+            self.rows_fetched += rows
+
+    def written(self, rows: int) -> None:
+        with self._lock:
+            self.rows_written += rows
+
+    def skipped(self, rows: int) -> None:
+        with self._lock:
+            self.rows_skipped += rows
+
+    def error(self, message: str) -> None:
+        with self._lock:
+            self.errors.append(message)
+
+    # ── reporting ───────────────────────────────────────────────────────────
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def covers(self, kind: str, full: bool) -> bool:
+        """Would this job already do everything a (kind, full) request asks?"""
+        kind_ok = self.kind == "full" or self.kind == kind
+        return kind_ok and (self.full or not full)
+
+    def duration(self) -> Optional[float]:
+        if not self.started_at:
+            return None
+        end = self.finished_at or _now()
+        return (end - self.started_at).total_seconds()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            duration = self.duration()
+            rows_per_sec = (self.rows_fetched / duration) if duration else None
+            phases = {name: p.to_dict() for name, p in self.phases.items()}
+            running = [name for name, p in phases.items() if not p["done"]]
+            etas = [p["eta_seconds"] for p in phases.values()
+                    if p["eta_seconds"] is not None]
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "full": self.full,
+                "status": self.status,
+                "phase": ",".join(running) if self.active and running else None,
+                "phases": phases,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+                "duration_seconds": duration,
+                "pages_fetched": self.pages_fetched,
+                "rows_fetched": self.rows_fetched,
+                "rows_written": self.rows_written,
+                "rows_skipped": self.rows_skipped,
+                "rows_per_second": rows_per_sec,
+                "eta_seconds": max(etas) if self.active and etas else None,
+                "errors": list(self.errors),
+                "result": self.result,
+            }
+
+
+class SyncJobManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Optional[SyncJob] = None
+        self._recent: deque = deque(maxlen=RECENT_JOBS)
+        self._listeners: List[Callable[[SyncJob], None]] = []
+
+    def submit(self, kind: str, full: bool = False) -> Tuple[SyncJob, bool]:
+        """
+        Register a new job, or return the running one if it covers this
+        request.  Returns (job, created).  Raises SyncConflict when another,
+        non-covering job is in flight.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown sync kind: {kind}")
+        with self._lock:
+            cur = self._current
+            if cur is not None and cur.active:
+                if cur.covers(kind, full):
+                    print(
+                        f"[SyncJobManager] Coalescing {kind} sync onto running job {cur.id}")
+                    return cur, False
+                raise SyncConflict(cur)
+            job = SyncJob(kind, full)
+            self._current = job
+            self._recent.appendleft(job)
+            return job, True
+
+    def run(self, job: SyncJob, target: Callable[..., Dict]) -> None:
+        """Execute `target(full=..., progress=job)` and record the outcome."""
+        job.status = "running"
+        job.started_at = _now()
+        print(f"[SyncJobManager] Job {job.id} ({job.kind}) started")
+        try:
+            last = self.last_run(job.kind, job.full)
+            job.previous_result = last.get("result") if last else None
+            job.result = target(full=job.full, progress=job)
+            job.status = "succeeded"
+        except Exception as e:
+            job.error(str(e))
+            job.status = "failed"
+            traceback.print_exc()
+        finally:
+            job.finished_at = _now()
+            print(
+                f"[SyncJobManager] Job {job.id} {job.status} in {job.duration():.1f}s")
+            self._persist(job)
+            for listener in list(self._listeners):
+                try:
+                    listener(job)
+                except Exception as e:
+                    print(f"[SyncJobManager] ⚠️ Listener failed: {e}")
+
+    def on_finished(self, listener: Callable[[SyncJob], None]) -> None:
+        self._listeners.append(listener)
+
+    def current(self) -> Optional[SyncJob]:
+        cur = self._current
+        return cur if cur is not None and cur.active else None
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        return next((j for j in self._recent if j.id == job_id), None)
+
+    def recent(self) -> List[SyncJob]:
+        return list(self._recent)
+
+    def history(self, limit: int = 20) -> List[Dict]:
+        try:
+            return (
+                supabase.table(HISTORY_TABLE)
+                .select("*")
+                .order("started_at", desc=True)
+                .limit(limit)
+                .execute()
+            ).data or []
+        except Exception as e:
+            print(f"[SyncJobManager] ⚠️ Could not read history: {e}")
+            return [self._history_row(j) for j in self.recent() if not j.active][:limit]
+
+    def last_run(self, kind: str, full: bool) -> Optional[Dict]:
+        for row in self.history(limit=20):
+            if (row.get("kind") == kind and bool(row.get("full")) == full
+                    and row.get("status") == "succeeded"):
+                return row
+        return None
+
+    @staticmethod
+    def _history_row(job: SyncJob) -> Dict:
+        d = job.to_dict()
+        return {
+            "job_id": d["job_id"],
+            "kind": d["kind"],
+            "full": d["full"],
+            "status": d["status"],
+            "started_at": d["started_at"],
+            "finished_at": d["finished_at"],
+            "duration_seconds": d["duration_seconds"],
+            "pages_fetched": d["pages_fetched"],
+            "rows_fetched": d["rows_fetched"],
+            "rows_written": d["rows_written"],
+            "rows_skipped": d["rows_skipped"],
+            "rows_per_second": d["rows_per_second"],
+            "errors": d["errors"],
+            "result": d["result"],
+        }
+
+    def _persist(self, job: SyncJob) -> None:
+        try:
+            supabase.table(HISTORY_TABLE).insert(
+                self._history_row(job)).execute()
+        except Exception as e:
+            print(f"[SyncJobManager] ⚠️ Could not persist run {job.id}: {e}")
+
+
+class SyncConflict(Exception):
+    def __init__(self, running: SyncJob):
+        super().__init__(
+            f"A {running.kind} sync ({running.id}) is already running")
+        self.running = running
+
+
+sync_jobs = SyncJobManager()
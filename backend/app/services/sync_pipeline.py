@@ -0,0 +1,82 @@
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List
+
+# Two-stage fetch → upsert pipeline.  A producer thread walks the HubSpot pages
+# and transforms each one into table rows; the calling thread writes them.  The
+# queue between the stages is bounded, so at most `max_pending` transformed
+# pages are held in memory however long the history is, and the next page is
+# fetched while the previous one is being written.
+
+DEFAULT_MAX_PENDING = 4
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def run_pipeline(
+    pages: Iterable[List[Dict]],
+    transform: Callable[[List[Dict]], List[Dict]],
+    sink: Callable[[List[Dict]], None],
+    max_pending: int = DEFAULT_MAX_PENDING,
+    name: str = "sync_pipeline",
+) -> Dict[str, int]:
+    """
+    Stream `pages` through `transform` (producer thread) into `sink` (caller's
+    thread).  Errors on either side stop both stages and are re-raised here.
+    Returns {"pages": n, "records": m} for what reached the sink.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for page in pages:
+                if stop.is_set():
+                    return
+                if not page:
+                    continue
+                if not _put(transform(page)):
+                    return
+        except BaseException as e:
+            _put(_Failure(e))
+            return
+        _put(_DONE)
+
+    producer = threading.Thread(
+        target=_produce, name=f"{name}-fetch", daemon=True)
+    producer.start()
+
+    stats = {"pages": 0, "records": 0}
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            sink(item)
+            stats["pages"] += 1
+            stats["records"] += len(item)
+            print(
+                f"[{name}] wrote page {stats['pages']} ({len(item)} rows, {stats['records']} total)")
+    finally:
+        # On failure the producer may be mid-request; it notices `stop` at its
+        # next put and exits on its own (daemon thread), so don't block on it.
+        stop.set()
+
+    producer.join()
+    return stats
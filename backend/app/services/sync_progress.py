@@ -0,0 +1,36 @@
+from typing import Optional
+
+# Progress hooks the sync code reports into.  The base class is a no-op so the
+# sync functions can be called directly (scripts, REPL) without a job object;
+# app.services.sync_jobs.SyncJob overrides these to track a running job.
+# Object syncs may run concurrently, so each reports into its own phase().
+
+
+class SyncProgress:
+    def phase(self, name: str) -> "SyncProgress":
+        """Progress scoped to one object sync (companies, time_entries, …)."""
+        return self
+
+    def expect(self, total: Optional[int]) -> None:
+        """Best-known number of records the current phase will fetch."""
+        pass
+
+    def fetched(self, rows: int) -> None:
+        """One page of `rows` records fetched from HubSpot."""
+        pass
+
+    def written(self, rows: int) -> None:
+        pass
+
+    def skipped(self, rows: int) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def done(self) -> None:
+        """The current phase finished."""
+        pass
+
+
+NULL_PROGRESS = SyncProgress()
@@ -0,0 +1,148 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from app.core.config import (
+    SYNC_INTERVAL_TIME_ENTRIES, SYNC_INTERVAL_COMPANIES, SYNC_INTERVAL_OWNERS,
+    SYNC_JITTER)
+from app.services import hubspot, rate_limit
+from app.services.sync_jobs import sync_jobs, SyncConflict
+
+# In-process scheduler for incremental syncs.
+#
+# Each object (time entries, companies, owners) has its own loop and interval.
+# A tick that finds another sync in flight is skipped and retried shortly; a
+# run that fails, or during which HubSpot throttled us, doubles that object's
+# interval (up to MAX_BACKOFF times) until a clean run resets it.  The syncs
+# themselves are blocking, so they run in a worker thread via asyncio.to_thread.
+
+BUSY_RETRY_SECONDS = 60
+MAX_BACKOFF = 8
+STARTUP_DELAY_SECONDS = 30
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ScheduledSync:
+    def __init__(self, name: str, kind: str, interval: float):
+        self.name = name
+        self.kind = kind
+        self.interval = interval
+        self.backoff = 1
+        self.last_success: Optional[datetime] = None
+        self.last_status: Optional[str] = None
+        self.last_job_id: Optional[str] = None
+        self.next_run: Optional[datetime] = None
+        self.runs = 0
+        self.skipped = 0
+
+    def delay(self) -> float:
+        base = self.interval * self.backoff
+        return max(1.0, base * (1 + random.uniform(-SYNC_JITTER, SYNC_JITTER)))
+
+    def max_staleness(self) -> float:
+        """Worst-case age (seconds) of this object's data while healthy."""
+        return self.interval * (1 + SYNC_JITTER) + BUSY_RETRY_SECONDS
+
+    def to_dict(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "interval_seconds": self.interval,
+            "backoff": self.backoff,
+            "max_staleness_seconds": self.max_staleness(),
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_status": self.last_status,
+            "last_job_id": self.last_job_id,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "runs": self.runs,
+            "skipped": self.skipped,
+        }
+
+
+class SyncScheduler:
+    def __init__(self, schedules: List[ScheduledSync]):
+        self.schedules = [s for s in schedules if s.interval > 0]
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        for sched in self.schedules:
+            print(
+                f"[SyncScheduler] {sched.name}: every {sched.interval:.0f}s (±{SYNC_JITTER:.0%})")
+            self._tasks.append(asyncio.create_task(
+                self._loop(sched), name=f"sync-{sched.name}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, sched: ScheduledSync) -> None:
+        # spread the first runs out so a restart doesn't fire everything at once
+        delay = STARTUP_DELAY_SECONDS * (1 + random.random())
+        while True:
+            sched.next_run = _now() + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+            try:
+                delay = await self._tick(sched)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SyncScheduler] ❌ {sched.name} tick failed: {e}")
+                delay = sched.delay()
+
+    async def _tick(self, sched: ScheduledSync) -> float:
+        if sync_jobs.current() is not None:
+            sched.skipped += 1
+            print(
+                f"[SyncScheduler] {sched.name}: another sync is running, retrying in {BUSY_RETRY_SECONDS}s")
+            return BUSY_RETRY_SECONDS
+        try:
+            job, created = sync_jobs.submit(sched.kind, full=False)
+        except SyncConflict:
+            sched.skipped += 1
+            return BUSY_RETRY_SECONDS
+        if not created:
+            sched.skipped += 1
+            return BUSY_RETRY_SECONDS
+
+        throttled_before = rate_limit.governor.throttled + \
+            rate_limit.search_governor.throttled
+        sched.runs += 1
+        sched.last_job_id = job.id
+        await asyncio.to_thread(sync_jobs.run, job, hubspot.SYNC_TARGETS[sched.kind])
+        throttled = rate_limit.governor.throttled + \
+            rate_limit.search_governor.throttled - throttled_before
+
+        sched.last_status = job.status
+        if job.status == "succeeded" and not throttled:
+            sched.last_success = job.finished_at
+            sched.backoff = 1
+        else:
+            if job.status == "succeeded":
+                sched.last_success = job.finished_at
+            sched.backoff = min(MAX_BACKOFF, sched.backoff * 2)
+            print(
+                f"[SyncScheduler] {sched.name}: {job.status}, {throttled} throttled responses; backing off ×{sched.backoff}")
+        return sched.delay()
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "objects": {s.name: s.to_dict() for s in self.schedules},
+        }
+
+
+sync_scheduler = SyncScheduler([
+    ScheduledSync("time_entries", "time", SYNC_INTERVAL_TIME_ENTRIES),
+    ScheduledSync("companies", "companies", SYNC_INTERVAL_COMPANIES),
+    ScheduledSync("owners", "owners", SYNC_INTERVAL_OWNERS),
+])
@@ -0,0 +1,92 @@
+from typing import Optional, Any
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import isoparse
+from app.supabase.client import supabase
+
+# Small key/value store in Supabase (`sync_state` table, see sql/sync_state.sql)
+# holding per-object sync watermarks and in-progress paging checkpoints.  Every
+# helper degrades gracefully when the table is missing so a fresh deployment
+# simply falls back to full, non-resumable syncs.
+
+STATE_TABLE = "sync_state"
+
+# HubSpot paging cursors go stale; don't resume runs older than this.
+CHECKPOINT_MAX_AGE = timedelta(hours=12)
+
+
+def get_state(key: str) -> Optional[Any]:
+    try:
+        rows = (
+            supabase.table(STATE_TABLE)
+            .select("value")
+            .eq("key", key)
+            .limit(1)
+            .execute()
+        ).data or []
+    except Exception as e:
+        print(f"[sync_state] ⚠️ Could not read '{key}': {e}")
+        return None
+    return rows[0].get("value") if rows else None
+
+
+def set_state(key: str, value: Any) -> None:
+    try:
+        supabase.table(STATE_TABLE).upsert(
+            {
+                "key": key,
+                "value": value,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+            on_conflict="key",
+        ).execute()
+    except Exception as e:
+        print(f"[sync_state] ⚠️ Could not write '{key}': {e}")
+
+
+def clear_state(key: str) -> None:
+    try:
+        supabase.table(STATE_TABLE).delete().eq("key", key).execute()
+    except Exception as e:
+        print(f"[sync_state] ⚠️ Could not clear '{key}': {e}")
+
+
+def get_watermark(object_key: str) -> Optional[str]:
+    """
+    Return the last-modified watermark (ISO-8601 string) recorded for
+    `object_key`, or None when the object has never been synced.
+    """
+    return get_state(f"watermark:{object_key}")
+
+
+def set_watermark(object_key: str, value: Optional[str]) -> None:
+    if not value:
+        return
+    print(f"[sync_state] watermark:{object_key} → {value}")
+    set_state(f"watermark:{object_key}", value)
+
+
+def get_checkpoint(object_key: str) -> Optional[dict]:
+    """
+    Return the paging checkpoint left by an unfinished sync of `object_key`,
+    or None if there is none (or it is too old to trust).
+    """
+    cp = get_state(f"checkpoint:{object_key}")
+    if not cp:
+        return None
+    try:
+        saved_at = isoparse(cp["saved_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if datetime.now(timezone.utc) - saved_at > CHECKPOINT_MAX_AGE:
+        print(f"[sync_state] Ignoring stale checkpoint for {object_key}")
+        return None
+    return cp
+
+
+def save_checkpoint(object_key: str, checkpoint: dict) -> None:
+    set_state(f"checkpoint:{object_key}", {
+        **checkpoint, "saved_at": datetime.now(timezone.utc).isoformat()})
+
+
+def clear_checkpoint(object_key: str) -> None:
+    clear_state(f"checkpoint:{object_key}")
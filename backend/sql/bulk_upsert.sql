@@ -0,0 +1,55 @@
+-- Bulk ingest used by app/services/bulk_writer.py when SUPABASE_BULK_INGEST=1.
+--
+-- Takes a whole batch as one NDJSON document (one row object per line),
+-- decodes it with the target table's own row type and merges it in a single
+-- INSERT … ON CONFLICT statement.  When a key appears more than once in the
+-- batch the last line wins.  Returns the number of rows merged.
+create or replace function public.bulk_upsert(
+    target_table text,
+    rows_ndjson  text,
+    columns      text[],
+    conflict     text default 'hubspot_id'
+) returns integer
+language plpgsql
+security invoker
+as $$
+declare
+    col_list    text;
+    update_list text;
+    merged      integer;
+begin
+    if target_table not in ('time_entries', 'hubspot_companies') then
+        raise exception 'bulk_upsert: table % is not allowed', target_table;
+    end if;
+
+    select string_agg(format('%I', c), ', '),
+           string_agg(format('%I = excluded.%I', c, c), ', ')
+                filter (where c <> conflict)
+      into col_list, update_list
+      from unnest(columns) as c;
+
+    execute format(
+        $sql$
+        with lines as (
+            select line::jsonb as doc, n
+              from regexp_split_to_table($1, E'\n') with ordinality as t(line, n)
+             where line <> ''
+        ),
+        latest as (
+            select distinct on (doc ->> %2$L) doc
+              from lines
+             order by doc ->> %2$L, n desc
+        )
+        insert into public.%1$I (%3$s)
+        select %3$s
+          from latest, jsonb_populate_record(null::public.%1$I, latest.doc)
+        on conflict (%2$I) %4$s
+        $sql$,
+        target_table, conflict, col_list,
+        coalesce('do update set ' || update_list, 'do nothing'))
+    using rows_ndjson;
+
+    get diagnostics merged = row_count;
+    return merged;
+end;
+$$;
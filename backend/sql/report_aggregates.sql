@@ -0,0 +1,100 @@
+-- Report aggregation pushed down into Postgres, called through supabase.rpc by
+-- app/services/aggregation.py.  Both functions are plain SQL over
+-- public.time_entries and return one jsonb document, so PostgREST's max-rows
+-- cap never truncates them.  If they are not installed the app computes the
+-- same results in Python (app/services/period_buckets.py).
+
+-- Hours per (company, window) for inclusive [start, end] windows, plus:
+--   rolling  per-company sums of entries at/after each p_rolling cutoff
+--   raw      per-company sums of every entry in the overall range (NULL
+--            company included)
+--   ids      entry ids per company in window p_ids_window (the "logs")
+-- Entries are those with start_time between the earliest window start and
+-- the latest window end; p_neq_tag behaves like PostgREST's neq (NULL tags
+-- never match), NULL meaning no tag filter.
+create or replace function public.report_period_usage(
+    p_starts     timestamptz[],
+    p_ends       timestamptz[],
+    p_rolling    timestamptz[] default '{}',
+    p_companies  bigint[]      default null,
+    p_entry_type text          default null,
+    p_neq_tag    text          default null,
+    p_ids_window integer       default null
+) returns jsonb
+language sql
+stable
+security invoker
+as $$
+    with w as (
+        select i - 1 as idx, p_starts[i] as ws, p_ends[i] as we
+          from generate_subscripts(p_starts, 1) as i
+    ),
+    e as (
+        select te.id, te.company_hubspot_id,
+               coalesce(te.hours, 0)::double precision as hours, te.start_time
+          from public.time_entries te
+         where te.start_time >= (select min(ws) from w)
+           and te.start_time <= (select max(we) from w)
+           and (p_companies is null or te.company_hubspot_id = any (p_companies))
+           and (p_entry_type is null or te.entry_type = p_entry_type)
+           and (p_neq_tag is null or te.tag <> p_neq_tag)
+    ),
+    placed as (
+        select w.idx, e.id, e.company_hubspot_id, e.hours
+          from e
+          join w on e.start_time between w.ws and w.we
+         where e.company_hubspot_id is not null
+    )
+    select jsonb_build_object(
+        'windows', (
+            select coalesce(jsonb_agg(jsonb_build_array(idx, company_hubspot_id, hours, n)
+                                       order by company_hubspot_id, idx), '[]')
+              from (select idx, company_hubspot_id, sum(hours) as hours, count(*) as n
+                      from placed group by idx, company_hubspot_id) s),
+        'rolling', (
+            select coalesce(jsonb_agg(jsonb_build_array(k, company_hubspot_id, hours)
+                                       order by company_hubspot_id, k), '[]')
+              from (select r.i - 1 as k, e.company_hubspot_id, sum(e.hours) as hours
+                      from e
+                      join generate_subscripts(p_rolling, 1) as r(i)
+                        on e.start_time >= p_rolling[r.i]
+                     where e.company_hubspot_id is not null
+                     group by r.i, e.company_hubspot_id) s),
+        'raw', (
+            select coalesce(jsonb_agg(jsonb_build_array(company_hubspot_id, hours)
+                                       order by company_hubspot_id), '[]')
+              from (select company_hubspot_id, sum(hours) as hours
+                      from e group by company_hubspot_id) s),
+        'ids', (
+            select coalesce(jsonb_agg(jsonb_build_array(company_hubspot_id, ids)
+                                       order by company_hubspot_id), '[]')
+              from (select company_hubspot_id, jsonb_agg(id order by id) as ids
+                      from placed
+                     where idx = p_ids_window
+                     group by company_hubspot_id) s),
+        'entries', (select count(*) from e),
+        'not_bucketed', (select count(*) from e where company_hubspot_id is not null)
+                        - (select count(*) from placed),
+        'min_start', (select min(start_time) from e where company_hubspot_id is not null),
+        'max_start', (select max(start_time) from e where company_hubspot_id is not null)
+    );
+$$;
+
+
+-- Hours per owner for entries with start_time in [p_start, p_end].
+create or replace function public.report_owner_hours(
+    p_start timestamptz,
+    p_end   timestamptz
+) returns jsonb
+language sql
+stable
+security invoker
+as $$
+    select coalesce(jsonb_agg(jsonb_build_array(owner_id, hours) order by owner_id), '[]')
+      from (select owner_id, sum(coalesce(hours, 0)::double precision) as hours
+              from public.time_entries
+             where start_time >= p_start
+               and start_time <= p_end
+               and owner_id is not null
+             group by owner_id) s;
+$$;
@@ -0,0 +1,18 @@
+-- Frozen per-(company, day) hours for closed 26th→25th periods, written by
+-- app/services/period_snapshots.py.  `key` is "<start>|<end>|<entry_type>|<tag filter>";
+-- rows are deleted when a late edit lands inside their period.  `created_at` is
+-- written by the app (the build time, also on rebuilds) and compared by other
+-- processes to notice a rebuild.  Optional: without this table snapshots are
+-- kept in memory only.
+create table if not exists public.report_snapshots (
+    key          text primary key,
+    period_start date not null,
+    period_end   date not null,
+    source       text not null,
+    as_of        timestamptz,
+    data         jsonb not null,
+    created_at   timestamptz not null default now()
+);
+
+create index if not exists report_snapshots_period_start
+    on public.report_snapshots (period_start);
@@ -0,0 +1,19 @@
+-- History of HubSpot sync runs written by app/services/sync_jobs.py.
+create table if not exists public.sync_runs (
+    job_id           text primary key,
+    kind             text not null,
+    "full"           boolean not null default false,
+    status           text not null,
+    started_at       timestamptz,
+    finished_at      timestamptz,
+    duration_seconds double precision,
+    pages_fetched    integer,
+    rows_fetched     integer,
+    rows_written     integer,
+    rows_skipped     integer,
+    rows_per_second  double precision,
+    errors           jsonb,
+    result           jsonb
+);
+
+create index if not exists sync_runs_started_at_idx on public.sync_runs (started_at desc);
@@ -0,0 +1,6 @@
+-- Key/value store used by app/services/sync_state.py for sync watermarks.
+create table if not exists public.sync_state (
+    key        text primary key,
+    value      jsonb,
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,139 @@
+-- Daily rollup of time_entries, read by the usage reports through
+-- app/services/daily_rollup.py.
+--
+-- One row per (UTC day of start_time, company, owner, entry_type, tag) with
+-- the summed hours and entry count.  Statement-level triggers on time_entries
+-- apply each write's delta (new rows added, old rows subtracted) from the
+-- transition tables, so every sync upsert, bulk_upsert batch and tombstone
+-- delete keeps it current while only touching the keys it changed.
+-- `updated_at` lets the app pull just the rollup rows changed since its last
+-- read.
+--
+-- After creating it, backfill once (and after any manual bulk edit that
+-- bypassed the triggers):
+--     select public.rebuild_time_entry_daily();
+create table if not exists public.time_entry_daily (
+    id                 bigint generated always as identity primary key,
+    day                date not null,
+    company_hubspot_id bigint,
+    owner_id           text,
+    entry_type         text,
+    tag                text,
+    hours              double precision not null default 0,
+    entries            integer not null default 0,
+    updated_at         timestamptz not null default now(),
+    constraint time_entry_daily_key unique nulls not distinct
+        (day, company_hubspot_id, owner_id, entry_type, tag)
+);
+
+create index if not exists time_entry_daily_updated_at
+    on public.time_entry_daily (updated_at);
+
+
+create or replace function public.time_entry_daily_apply()
+returns trigger
+language plpgsql
+as $$
+begin
+    -- only the transition tables that exist for this event are referenced
+    if TG_OP = 'INSERT' then
+        insert into public.time_entry_daily as d
+            (day, company_hubspot_id, owner_id, entry_type, tag, hours, entries, updated_at)
+        select (start_time at time zone 'utc')::date, company_hubspot_id, owner_id::text,
+               entry_type, tag, sum(coalesce(hours, 0)), count(*), now()
+          from new_rows
+         where start_time is not null
+         group by 1, 2, 3, 4, 5
+        on conflict on constraint time_entry_daily_key do update
+            set hours = d.hours + excluded.hours,
+                entries = d.entries + excluded.entries,
+                updated_at = now();
+
+    elsif TG_OP = 'DELETE' then
+        update public.time_entry_daily d
+           set hours = case when d.entries - g.entries = 0 then 0 else d.hours - g.hours end,
+               entries = d.entries - g.entries,
+               updated_at = now()
+          from (
+              select (start_time at time zone 'utc')::date as day, company_hubspot_id,
+                     owner_id::text as owner_id, entry_type, tag,
+                     sum(coalesce(hours, 0)) as hours, count(*) as entries
+                from old_rows
+               where start_time is not null
+               group by 1, 2, 3, 4, 5
+          ) g
+         where d.day = g.day
+           and d.company_hubspot_id is not distinct from g.company_hubspot_id
+           and d.owner_id is not distinct from g.owner_id
+           and d.entry_type is not distinct from g.entry_type
+           and d.tag is not distinct from g.tag;
+
+    else  -- UPDATE: net delta per key; keys whose totals didn't move are skipped
+        insert into public.time_entry_daily as d
+            (day, company_hubspot_id, owner_id, entry_type, tag, hours, entries, updated_at)
+        select day, company_hubspot_id, owner_id, entry_type, tag, sum(hours), sum(entries), now()
+          from (
+              select (start_time at time zone 'utc')::date as day, company_hubspot_id,
+                     owner_id::text as owner_id, entry_type, tag,
+                     coalesce(hours, 0) as hours, 1 as entries
+                from new_rows
+               where start_time is not null
+              union all
+              select (start_time at time zone 'utc')::date, company_hubspot_id,
+                     owner_id::text, entry_type, tag,
+                     -coalesce(hours, 0), -1
+                from old_rows
+               where start_time is not null
+          ) delta
+         group by 1, 2, 3, 4, 5
+        having sum(entries) <> 0 or sum(hours) <> 0
+        on conflict on constraint time_entry_daily_key do update
+            set hours = case when d.entries + excluded.entries = 0
+                             then 0 else d.hours + excluded.hours end,
+                entries = d.entries + excluded.entries,
+                updated_at = now();
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists time_entry_daily_ins on public.time_entries;
+create trigger time_entry_daily_ins
+    after insert on public.time_entries
+    referencing new table as new_rows
+    for each statement execute function public.time_entry_daily_apply();
+
+drop trigger if exists time_entry_daily_upd on public.time_entries;
+create trigger time_entry_daily_upd
+    after update on public.time_entries
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function public.time_entry_daily_apply();
+
+drop trigger if exists time_entry_daily_del on public.time_entries;
+create trigger time_entry_daily_del
+    after delete on public.time_entries
+    referencing old table as old_rows
+    for each statement execute function public.time_entry_daily_apply();
+
+
+-- Recompute the whole rollup from time_entries.  Returns the row count.
+create or replace function public.rebuild_time_entry_daily()
+returns integer
+language plpgsql
+as $$
+declare
+    built integer;
+begin
+    lock table public.time_entry_daily in exclusive mode;
+    delete from public.time_entry_daily;
+    insert into public.time_entry_daily
+        (day, company_hubspot_id, owner_id, entry_type, tag, hours, entries)
+    select (start_time at time zone 'utc')::date, company_hubspot_id, owner_id::text,
+           entry_type, tag, sum(coalesce(hours, 0)), count(*)
+      from public.time_entries
+     where start_time is not null
+     group by 1, 2, 3, 4, 5;
+    get diagnostics built = row_count;
+    return built;
+end;
+$$;